@@ -0,0 +1,122 @@
+"""bench_database.py
+
+Import many subscribers one add() at a time (the old check-then-insert,
+commit-per-user path) and with add_many, then load them from the old
+JSON-column schema and from the normalised user_feeds schema, reporting time
+and peak Python memory.
+
+    python bench/bench_database.py --users 100000 --single-adds 2000
+"""
+
+import argparse
+import json
+from pathlib import Path
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT / "src"))
+
+from commons import User  # noqa: E402
+from database import Database  # noqa: E402
+from ingester import FEEDS, Ingester  # noqa: E402
+
+
+def selections(users: int):
+    rng = random.Random(0)
+    keywords = [feed.name for feed in FEEDS] + ["business", "sport", "asia", "singapore", "world", "tech"]
+    return [rng.sample(keywords, rng.randint(1, 6)) for _ in range(users)]
+
+
+def legacy_get_all(path: str):
+    conn = sqlite3.connect(path)
+    users = []
+    for username, name, payload in conn.execute("SELECT username, name, selected_feeds FROM users").fetchall():
+        users.append(User(username=username, name=name, selected_feeds=Ingester.match_feeds(json.loads(payload))))
+    conn.close()
+    return users
+
+
+def legacy_add(conn: sqlite3.Connection, username: str, name: str, feeds) -> None:
+    if conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is not None:
+        raise ValueError(username)
+    conn.execute("INSERT INTO users (username, name, selected_feeds) VALUES (?, ?, ?)", (username, name, json.dumps(feeds)))
+    conn.commit()
+
+
+def bench_import(tmp: str, chosen, single_adds: int) -> None:
+    records = [(f"user{i}", f"User {i}", feeds) for i, feeds in enumerate(chosen)]
+
+    conn = sqlite3.connect(f"{tmp}/import_legacy.db")
+    conn.execute("CREATE TABLE users (username TEXT PRIMARY KEY, name TEXT NOT NULL, selected_feeds TEXT NOT NULL)")
+    start = time.perf_counter()
+    for record in records[:single_adds]:
+        legacy_add(conn, *record)
+    legacy = (time.perf_counter() - start) / single_adds
+    conn.close()
+
+    db = Database(f"{tmp}/import_add.db")
+    start = time.perf_counter()
+    for record in records[:single_adds]:
+        db.add(*record)
+    single = (time.perf_counter() - start) / single_adds
+    db.conn.close()
+
+    db = Database(f"{tmp}/import_many.db")
+    start = time.perf_counter()
+    db.add_many(records)
+    bulk = time.perf_counter() - start
+    db.conn.close()
+
+    n = len(records)
+    print(f"{'legacy add(), default journal':<32} {legacy * n:7.2f}s for {n} (extrapolated from {single_adds})")
+    print(f"{'add(), WAL':<32} {single * n:7.2f}s for {n} (extrapolated from {single_adds})")
+    print(f"{'add_many, one transaction':<32} {bulk:7.2f}s for {n} ({n / bulk:,.0f} users/s)")
+
+
+def measure(label: str, load) -> None:
+    # Timed and traced separately: tracemalloc slows allocation-heavy code.
+    start = time.perf_counter()
+    count = load()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    load()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {count:>7} users  {elapsed:6.2f}s  peak {peak / 2**20:7.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--single-adds", type=int, default=2000, help="add() calls timed before extrapolating")
+    args = parser.parse_args()
+    chosen = selections(args.users)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_import(tmp, chosen, min(args.single_adds, args.users))
+        legacy_path = f"{tmp}/legacy.db"
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("CREATE TABLE users (username TEXT PRIMARY KEY, name TEXT NOT NULL, selected_feeds TEXT NOT NULL)")
+        conn.executemany(
+            "INSERT INTO users VALUES (?, ?, ?)",
+            ((f"user{i}", f"User {i}", json.dumps(feeds)) for i, feeds in enumerate(chosen)),
+        )
+        conn.commit()
+        conn.close()
+
+        measure("legacy JSON get_all", lambda: len(legacy_get_all(legacy_path)))
+        start = time.perf_counter()
+        db = Database(legacy_path) # Migrates the JSON column
+        print(f"migration                    {time.perf_counter() - start:6.2f}s")
+        measure("normalised get_all", lambda: len(db.get_all()))
+        measure("normalised iter_users", lambda: sum(1 for _user in db.iter_users()))
+        db.conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""bench_http.py
+
+Fetch feeds from the local feed server over several rounds with a fresh
+connection per request (the old requests.get path) and with the shared pooled
+HttpClient, reporting time and TCP connections opened.
+
+    python bench/bench_http.py --feeds 17 --rounds 3 --connect-delay 0.05
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sys
+import time
+
+import requests
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT / "src"))
+sys.path.append(str(PROJECT_ROOT / "bench"))
+
+from feed_server import FeedServer  # noqa: E402
+from http_client import HttpClient  # noqa: E402
+
+
+def fetch_all(server: FeedServer, get, urls, rounds: int, workers: int):
+    before = server.connections
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in range(rounds):
+            for response in pool.map(get, urls):
+                response.raise_for_status()
+    return time.perf_counter() - start, server.connections - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--feeds", type=int, default=17)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--delay", type=float, default=0.05)
+    parser.add_argument("--connect-delay", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with FeedServer(delay=args.delay, connect_delay=args.connect_delay) as server:
+        urls = [server.url(f"feed/{i}") for i in range(args.feeds)]
+        fresh = fetch_all(server, lambda url: requests.get(url, timeout=10), urls, args.rounds, args.workers)
+        pooled = fetch_all(server, lambda url: HttpClient.get(url, timeout=10), urls, args.rounds, args.workers)
+        HttpClient.close()
+
+    requests_made = args.feeds * args.rounds
+    print(f"{requests_made} requests, delay={args.delay}s, connect_delay={args.connect_delay}s, workers={args.workers}")
+    print(f"fresh connections: {fresh[0]:.2f}s  {fresh[1]} connection(s)")
+    print(f"shared HttpClient: {pooled[0]:.2f}s  {pooled[1]} connection(s) ({fresh[0] / pooled[0]:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""bench_ingester.py
+
+Compare sequential and concurrent feed ingestion against the local feed server.
+
+    python bench/bench_ingester.py --feeds 17 --delay 0.3
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import time
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT / "src"))
+sys.path.append(str(PROJECT_ROOT / "bench"))
+
+from commons import Feed  # noqa: E402
+from feed_server import FeedServer  # noqa: E402
+from ingester import Ingester  # noqa: E402
+
+
+def run(feeds, max_workers: int) -> float:
+    start = time.perf_counter()
+    results = Ingester.populate_feeds(feeds, max_workers=max_workers)
+    elapsed = time.perf_counter() - start
+    failed = [result for result in results if not result.ok]
+    if failed:
+        raise RuntimeError(f"{len(failed)} feed(s) failed: {failed[0].error}")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--feeds", type=int, default=17)
+    parser.add_argument("--delay", type=float, default=0.3)
+    parser.add_argument("--workers", type=int, default=Ingester.MAX_WORKERS)
+    args = parser.parse_args()
+
+    with FeedServer(delay=args.delay) as server:
+        feeds = [Feed(name=f"Local {i}", tags=[], url=server.url(f"feed/{i}")) for i in range(args.feeds)]
+        sequential = run(feeds, max_workers=1)
+        concurrent = run(feeds, max_workers=args.workers)
+
+    print(f"feeds={args.feeds} delay={args.delay}s workers={args.workers}")
+    print(f"sequential: {sequential:.2f}s")
+    print(f"concurrent: {concurrent:.2f}s ({sequential / concurrent:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
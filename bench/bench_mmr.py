@@ -0,0 +1,62 @@
+"""bench_mmr.py
+
+Time TopExtractor.mmr_select against the original list-based implementation.
+
+    python bench/bench_mmr.py --sizes 100 1000 10000
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT / "src"))
+
+from top_extractor import TopExtractor  # noqa: E402
+
+
+def legacy_mmr_select(candidates, embeddings, top_n=TopExtractor.TOP_N, lambda_param=0.6):
+    sim_matrix = cosine_similarity(embeddings)
+    centroid = embeddings.mean(axis=0)
+    relevance = cosine_similarity(embeddings, centroid.reshape(1, -1)).flatten()
+    selected_idx = [np.argmax(relevance)]
+    while len(selected_idx) < top_n:
+        remaining = [i for i in range(len(candidates)) if i not in selected_idx]
+        scores = []
+        for i in remaining:
+            redundancy = max(sim_matrix[i][selected_idx])
+            scores.append((lambda_param * relevance[i] - (1 - lambda_param) * redundancy, i))
+        selected_idx.append(max(scores)[1])
+    return [candidates[i] for i in selected_idx]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-n", type=int, default=TopExtractor.TOP_N)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n in args.sizes:
+        embeddings = rng.normal(size=(n, args.dim)).astype(np.float32)
+        candidates = [f"Headline {i}" for i in range(n)]
+        legacy, legacy_time = timed(legacy_mmr_select, candidates, embeddings, top_n=args.top_n)
+        current, current_time = timed(TopExtractor.mmr_select, candidates, embeddings, top_n=args.top_n)
+        assert current == legacy, f"selection mismatch at n={n}"
+        print(f"n={n:>6}  legacy {legacy_time * 1000:9.1f} ms  vectorised {current_time * 1000:9.1f} ms  "
+              f"({legacy_time / current_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
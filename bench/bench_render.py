@@ -0,0 +1,102 @@
+"""bench_render.py
+
+Render digests for many users with the compiled Jinja2 template and with the
+original f-string composition, and report renders per second for each.
+
+    python bench/bench_render.py --users 10000
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT / "src"))
+
+from commons import Quote  # noqa: E402
+from organiser import DigestContent, Headline, Organiser  # noqa: E402
+
+
+def legacy_compose(content: DigestContent, context) -> str:
+    """The f-string composition Organiser used before templates (no escaping)."""
+    def box(title, body):
+        return f"<div class='digest-box'>\n<h3>{title}</h3>\n{body}\n</div>"
+
+    def paragraphs(items):
+        return "\n".join(f"<p>{para}</p>" for para in items)
+
+    name = "" if content.name == "Singapore" else f" for {content.name}"
+    header = (
+        "<div class='digest-header'>\n"
+        f"{context.logo_html}\n"
+        f"<h1>The Morning Digest{name}</h1>\n"
+        f"{context.date_html}{context.sponsor_html}\n"
+        f"{context.quote_html}\n"
+        f"{context.translations_html}\n"
+        "</div>"
+    )
+    items = "".join(f"<li><a href='{head.url}'>{head.title}</a></li>" for head in content.top_headlines)
+    headlines = f"<ul>{items}</ul>" if items else "<p>No fresh headlines right now — check back soon.</p>"
+    share = "\n".join([
+        f"<p>{content.partnership_message}</p>",
+        "<p>🤝 Partner with us: <a href='#'>Submit a sponsorship enquiry →</a></p>",
+        "<p>✨ Share with a friend: forwarding is the best compliment.</p>",
+        "<p>🌏 Got a story? Tell us about SG or regional stories we should feature.</p>",
+    ])
+    sections = [
+        box(f"Good Morning {content.name}", paragraphs(Organiser.summary_paragraphs(content.summary))),
+        box(f"Presented by {content.sponsor_name}", paragraphs([content.sponsor_message])),
+        box("Top Headlines", headlines),
+        box("Partnership + Share", share),
+    ]
+    return "\n\n".join(filter(None, [context.style_block, header, *sections]))
+
+
+def make_contents(users: int, headlines: int):
+    summary = "\n\n".join(f"Paragraph {i}: markets, weather & transport news for the morning." for i in range(4))
+    return [
+        DigestContent(
+            name=f"Reader {i}",
+            summary=summary,
+            sponsor_name=Organiser.SPONSOR_NAME,
+            sponsor_message=Organiser.SPONSOR_MESSAGE,
+            partnership_message=Organiser.PARTNERSHIP_MESSAGE,
+            top_headlines=[Headline(f"Headline {j} for reader {i}", f"https://example.com/{i}/{j}") for j in range(headlines)],
+        )
+        for i in range(users)
+    ]
+
+
+def timed(compose, contents, context) -> float:
+    start = time.perf_counter()
+    for content in contents:
+        compose(content, context)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--headlines", type=int, default=15)
+    args = parser.parse_args()
+
+    Organiser.get_daily_quote = staticmethod(lambda: Quote("Keep going.", "Bench"))
+    with tempfile.TemporaryDirectory() as output_dir:
+        context = Organiser.render_context(output_dir=output_dir)
+    contents = make_contents(args.users, args.headlines)
+
+    start = time.perf_counter()
+    Organiser.digest_template()
+    compile_time = time.perf_counter() - start
+
+    legacy_time = timed(legacy_compose, contents, context)
+    template_time = timed(Organiser._compose_markdown, contents, context)
+    print(f"users={args.users}  template compiled once in {compile_time * 1000:.1f} ms")
+    print(f"legacy f-strings  {args.users / legacy_time:10,.0f} renders/s  ({legacy_time:.2f}s)")
+    print(f"jinja2 template   {args.users / template_time:10,.0f} renders/s  ({template_time:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""bench_summariser.py
+
+Time sequential and concurrent summarisation against a fake OpenAI client that
+sleeps for a fixed latency and occasionally answers with a 429.
+
+    python bench/bench_summariser.py --users 20 --latency 0.5 --workers 4
+"""
+
+import argparse
+import os
+from pathlib import Path
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT / "src"))
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from commons import Article, Feed, User  # noqa: E402
+from summariser import Summariser  # noqa: E402
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FakeResponses:
+    def __init__(self, latency: float, rate_limit_ratio: float) -> None:
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.random = random.Random(1)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def create(self, model, instructions, input, **_kwargs):
+        with self.lock:
+            self.calls += 1
+            limited = self.random.random() < self.rate_limit_ratio
+        time.sleep(self.latency)
+        if limited:
+            raise RateLimitError("rate limited")
+        return SimpleNamespace(output_text=f"Digest of {len(input)} characters")
+
+
+def make_users(count: int):
+    feeds = [
+        Feed(
+            name=f"Feed {i}",
+            tags=[],
+            url="",
+            article=[Article(title=f"Story {i}.{j}", url="", summary="Details") for j in range(10)],
+        )
+        for i in range(8)
+    ]
+    return [User(username=f"user{i}", name=f"User {i}", selected_feeds=feeds[: 1 + i % 8]) for i in range(count)]
+
+
+def run(workers: int, args) -> tuple:
+    Summariser.CLIENT = SimpleNamespace(responses=FakeResponses(args.latency, args.rate_limit_ratio))
+    Summariser.BACKOFF = args.latency / 4
+    summariser = Summariser(model="fake", max_workers=workers)
+    users = make_users(args.users)
+    start = time.perf_counter()
+    summariser.summarise(users)
+    return time.perf_counter() - start, [user.summary for user in users], summariser.client.responses.calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=Summariser.MAX_WORKERS)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    sequential, sequential_out, sequential_calls = run(1, args)
+    concurrent, concurrent_out, concurrent_calls = run(args.workers, args)
+    assert sequential_out == concurrent_out, "concurrent output differs from sequential"
+
+    print(f"users={args.users} latency={args.latency}s workers={args.workers}")
+    print(f"sequential: {sequential:.2f}s ({sequential_calls} calls)")
+    print(f"concurrent: {concurrent:.2f}s ({concurrent_calls} calls, {sequential / concurrent:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""bench_workers.py
+
+Render and write digests for many users on one thread (the default path) and
+across --workers process pools, reporting digests per second for each.
+
+    python bench/bench_workers.py --users 10000 --workers 2 4
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT / "src"))
+
+from commons import Article, Quote, User  # noqa: E402
+from organiser import Organiser  # noqa: E402
+
+
+def make_users(users: int, headlines: int):
+    summary = "\n\n".join(f"Paragraph {i}: markets, weather & transport news for the morning." for i in range(4))
+    # Readers share a small set of top articles, as users with the same feeds do.
+    articles = [Article(f"Headline {j}", f"https://example.com/{j}") for j in range(headlines * 4)]
+    return [
+        User(
+            username=f"user{i}",
+            name=f"Reader {i}",
+            selected_feeds=[],
+            summary=summary,
+            top_articles=articles[(i % 4) * headlines:(i % 4 + 1) * headlines],
+        )
+        for i in range(users)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--headlines", type=int, default=15)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    Organiser.get_daily_quote = staticmethod(lambda: Quote("Keep going.", "Bench"))
+    users = make_users(args.users, args.headlines)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        context = Organiser.render_context(output_dir=output_dir)
+        start = time.perf_counter()
+        Organiser.write_many((f"{output_dir}/serial_{i}.md", Organiser.render(user, context)) for i, user in enumerate(users))
+        serial = time.perf_counter() - start
+        print(f"serial      {args.users / serial:10,.0f} digests/s  ({serial:.2f}s)")
+
+        for workers in args.workers:
+            jobs = ((f"{output_dir}/workers{workers}_{i}.md", user) for i, user in enumerate(users))
+            start = time.perf_counter()
+            _results, reports = Organiser.render_parallel(jobs, context, workers=workers)
+            elapsed = time.perf_counter() - start
+            busiest = max(report.render_time + report.write_time for report in reports)
+            print(f"workers={workers:<3} {args.users / elapsed:10,.0f} digests/s  ({elapsed:.2f}s, "
+                  f"{serial / elapsed:.1f}x, busiest worker {busiest:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""feed_server.py
+
+Local HTTP stand-in for the RSS publishers so ingestion can be benchmarked offline.
+Every path serves the same small RSS document after an artificial delay.
+connect_delay is paid once per new TCP connection, standing in for the TLS
+handshake, so connection reuse shows up in timings; connections counts them.
+"""
+
+from email.utils import format_datetime
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+from typing import Tuple
+
+
+def build_rss(items: int = 20) -> bytes:
+    published = format_datetime(datetime.now(timezone.utc))
+    entries = "".join(
+        "<item>"
+        f"<title>Local story {i}</title>"
+        f"<link>http://localhost/story/{i}</link>"
+        f"<pubDate>{published}</pubDate>"
+        f"<description>Summary for local story {i}</description>"
+        "</item>"
+        for i in range(items)
+    )
+    return (
+        "<?xml version='1.0' encoding='UTF-8'?>"
+        f"<rss version='2.0'><channel><title>Local</title>{entries}</channel></rss>"
+    ).encode("utf-8")
+
+
+class FeedServer:
+    """Serve build_rss() on 127.0.0.1 with a fixed per-request delay."""
+
+    def __init__(self, delay: float = 0.3, items: int = 20, connect_delay: float = 0.0) -> None:
+        body = build_rss(items)
+        self.connections = 0
+        server = self
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Allow keep-alive
+            disable_nagle_algorithm = True # Headers and body go out in separate writes
+
+            def setup(self) -> None:
+                with lock:
+                    server.connections += 1
+                time.sleep(connect_delay)
+                super().setup()
+
+            def do_GET(self) -> None:
+                time.sleep(delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/rss+xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.server.server_address[:2]
+
+    def url(self, path: str) -> str:
+        host, port = self.address
+        return f"http://{host}:{port}/{path.lstrip('/')}"
+
+    def __enter__(self) -> "FeedServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,520 @@
+"""cache.py
+
+SQLite-backed caches that persist pipeline work between Morning Digest runs.
+"""
+
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+import hashlib
+import json
+import pickle
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+
+from commons import Article
+
+
+class SqliteCache:
+    """Base class: lazily opened, thread-safe SQLite connection with one schema."""
+
+    SCHEMA: str = ""
+
+    def __init__(self, path: str = "data/cache.db") -> None:
+        self.db_path = Path(path)
+        self.lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Opened on first use so constructing a cache never touches the disk.
+        with self.lock:
+            if self._conn is None:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.executescript(self.SCHEMA)
+                self._migrate(self._conn)
+            return self._conn
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        """Bring tables created by older versions up to SCHEMA."""
+
+    def close(self) -> None:
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+@dataclass
+class CachedFeed:
+    etag: Optional[str] # ETag header of the cached response
+    last_modified: Optional[str] # Last-Modified header of the cached response
+    articles: Sequence[Article] # Parsed articles of the cached response
+
+
+class FeedCache(SqliteCache):
+    """Conditional GET validators and parsed articles, keyed by feed URL."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS feed_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            articles TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        );
+    """
+
+    def get(self, url: str) -> Optional[CachedFeed]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, articles FROM feed_cache WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, payload = row
+        articles = [Article(**article) for article in json.loads(payload)]
+        return CachedFeed(etag=etag, last_modified=last_modified, articles=articles)
+
+    def put(
+        self,
+        url: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        articles: Sequence[Article],
+    ) -> None:
+        payload = json.dumps([asdict(article) for article in articles], ensure_ascii=False)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO feed_cache (url, etag, last_modified, articles, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, payload, time.time()),
+            )
+            self.conn.commit()
+
+
+class EmbeddingCache(SqliteCache):
+    """Content-addressed float32 embeddings, keyed by model name and text hash.
+
+    Vectors are kept in memory for the current run and persisted as SQLite
+    blobs so later runs skip re-encoding headlines they have already seen.
+    accessed_at is refreshed once per run for every vector used, and prune
+    drops the ones no run has used since a cutoff.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            model TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            accessed_at REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (model, text_hash)
+        );
+    """
+    TTL: timedelta = timedelta(days=7) # Same as the article store's retention
+
+    def __init__(self, path: str = "data/cache.db") -> None:
+        super().__init__(path)
+        self.memory: Dict[tuple[str, str], np.ndarray] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        normalised = " ".join(unicodedata.normalize("NFKC", text).split())
+        return hashlib.sha1(normalised.encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(embedding_cache)")}
+        if "accessed_at" not in columns:
+            # Older caches: count every existing vector as used now.
+            conn.execute("ALTER TABLE embedding_cache ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+            conn.execute("UPDATE embedding_cache SET accessed_at = ?", (time.time(),))
+        # Created here, not in SCHEMA, so it never precedes the column on old caches.
+        conn.execute("CREATE INDEX IF NOT EXISTS embedding_cache_accessed ON embedding_cache (accessed_at)")
+        conn.commit()
+
+    def _load(self, model: str, hashes: Sequence[str]) -> None:
+        missing = [h for h in set(hashes) if (model, h) not in self.memory]
+        loaded: List[str] = []
+        # Stay well below SQLite's bound-parameter limit.
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT text_hash, vector FROM embedding_cache WHERE model = ? AND text_hash IN ({placeholders})",
+                    (model, *chunk),
+                ).fetchall()
+            for text_hash, blob in rows:
+                self.memory[(model, text_hash)] = np.frombuffer(blob, dtype=np.float32)
+                loaded.append(text_hash)
+        if loaded:
+            # Vectors already in memory were touched when first loaded or stored this run.
+            now = time.time()
+            with self.lock:
+                self.conn.executemany(
+                    "UPDATE embedding_cache SET accessed_at = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash in loaded],
+                )
+                self.conn.commit()
+
+    def _store(self, model: str, vectors: Dict[str, np.ndarray]) -> None:
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (model, text_hash, vector, accessed_at) VALUES (?, ?, ?, ?)",
+                [(model, text_hash, vector.tobytes(), now) for text_hash, vector in vectors.items()],
+            )
+            self.conn.commit()
+        for text_hash, vector in vectors.items():
+            self.memory[(model, text_hash)] = vector
+
+    def encode(
+        self,
+        model: str,
+        texts: Sequence[str],
+        encoder: Callable[[List[str]], np.ndarray],
+    ) -> np.ndarray:
+        """Return embeddings for texts, encoding only those not cached yet."""
+        if len(texts) == 0:
+            return np.asarray(encoder(list(texts)), dtype=np.float32)
+        hashes = [self.text_hash(text) for text in texts]
+        with self.lock:
+            self._load(model, hashes)
+
+            pending: Dict[str, str] = {}
+            for text, text_hash in zip(texts, hashes):
+                if (model, text_hash) in self.memory or text_hash in pending:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    pending.setdefault(text_hash, text)
+
+            if pending:
+                encoded = np.asarray(encoder(list(pending.values())), dtype=np.float32)
+                self._store(model, dict(zip(pending.keys(), encoded)))
+
+            return np.stack([self.memory[(model, text_hash)] for text_hash in hashes])
+
+    def prune(self, before: datetime) -> int:
+        """Delete vectors no run has used since the cutoff."""
+        with self.lock:
+            deleted = self.conn.execute(
+                "DELETE FROM embedding_cache WHERE accessed_at < ?",
+                (before.timestamp(),),
+            ).rowcount
+            self.conn.commit()
+        return deleted
+
+
+class ResponseCache(SqliteCache):
+    """LLM completions keyed by a hash of (model, instructions, prompt).
+
+    Entries expire after ttl seconds; beyond max_entries the least recently
+    used are evicted. With bypass set, lookups miss but fresh responses are
+    still stored for the next run.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS response_cache (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS response_cache_accessed ON response_cache (accessed_at);
+    """
+
+    def __init__(
+        self,
+        path: str = "data/cache.db",
+        ttl: float = 24 * 60 * 60,
+        max_entries: int = 1000,
+        bypass: bool = False,
+    ) -> None:
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = None
+            if not self.bypass:
+                row = self.conn.execute(
+                    "SELECT response FROM response_cache WHERE key = ? AND created_at >= ?",
+                    (key, time.time() - self.ttl),
+                ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self.evict(now)
+            self.conn.commit()
+
+    def evict(self, now: float) -> None:
+        self.conn.execute("DELETE FROM response_cache WHERE created_at < ?", (now - self.ttl,))
+        self.conn.execute(
+            "DELETE FROM response_cache WHERE key IN ("
+            "SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class ArticleStore(SqliteCache):
+    """Every article seen across runs, keyed by normalised URL.
+
+    A row is rewritten only when its content hash (title and summary)
+    changes; first_seen never moves. feed_articles records which feeds
+    carried each article, so a feed's recent window is one indexed query.
+    Headline vectors are not kept here; EmbeddingCache holds them by text.
+    """
+
+    SCHEMA = """
+        PRAGMA foreign_keys = ON;
+        CREATE TABLE IF NOT EXISTS articles (
+            url_key TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            title TEXT NOT NULL,
+            url TEXT NOT NULL,
+            summary TEXT,
+            published TEXT,
+            published_at REAL,
+            first_seen REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS articles_published_at ON articles (published_at);
+        DROP INDEX IF EXISTS articles_first_seen; -- Nothing queries by first_seen alone
+        CREATE TABLE IF NOT EXISTS feed_articles (
+            feed TEXT NOT NULL,
+            url_key TEXT NOT NULL REFERENCES articles(url_key) ON DELETE CASCADE,
+            PRIMARY KEY (feed, url_key)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS feed_articles_url_key ON feed_articles (url_key);
+    """
+    TRACKING_PARAMS = {"fbclid", "gclid", "cid", "ref"} # Plus any utm_* parameter
+
+    @staticmethod
+    def normalise_url(url: str) -> str:
+        """Lower-case scheme and host, drop fragments and tracking parameters, sort the query."""
+        parts = urlsplit(url.strip())
+        query = sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not (key.lower().startswith("utm_") or key.lower() in ArticleStore.TRACKING_PARAMS)
+        )
+        path = parts.path.rstrip("/") or "/"
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+    @staticmethod
+    def content_hash(article: Article) -> str:
+        return EmbeddingCache.text_hash(f"{article.title}\n{article.summary or ''}")
+
+    @staticmethod
+    def published_at(article: Article) -> Optional[float]:
+        try:
+            parsed = parsedate_to_datetime(article.published or "")
+        except (TypeError, ValueError):
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+    def upsert(self, feed: str, articles: Sequence[Article]) -> List[Article]:
+        """Record a feed's articles; return those new or changed since the last run."""
+        rows = {}
+        for article in articles:
+            if article.url:
+                rows[self.normalise_url(article.url)] = (article, self.content_hash(article))
+        if not rows:
+            return []
+        now = time.time()
+        with self.lock:
+            known = dict(self._select_in("SELECT url_key, content_hash FROM articles WHERE url_key IN ({})", list(rows)))
+            fresh = [(key, article, digest) for key, (article, digest) in rows.items() if known.get(key) != digest]
+            self.conn.executemany(
+                "INSERT INTO articles (url_key, content_hash, title, url, summary, published, published_at, first_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (url_key) DO UPDATE SET content_hash = excluded.content_hash, title = excluded.title, "
+                "summary = excluded.summary, published = excluded.published, published_at = excluded.published_at",
+                [
+                    (key, digest, article.title, article.url, article.summary, article.published, self.published_at(article), now)
+                    for key, article, digest in fresh
+                ],
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO feed_articles (feed, url_key) VALUES (?, ?)",
+                [(feed, key) for key in rows],
+            )
+            self.conn.commit()
+        return [article for _key, article, _digest in fresh]
+
+    def window(self, feed: str, since: datetime, until: datetime) -> List[Article]:
+        """The feed's articles published in [since, until), newest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT a.title, a.url, a.published, a.summary FROM feed_articles AS f "
+                "JOIN articles AS a ON a.url_key = f.url_key "
+                "WHERE f.feed = ? AND a.published_at >= ? AND a.published_at < ? "
+                "ORDER BY a.published_at DESC, a.first_seen",
+                (feed, since.timestamp(), until.timestamp()),
+            ).fetchall()
+        return [Article(title=title, url=url, published=published, summary=summary) for title, url, published, summary in rows]
+
+    def prune(self, before: datetime) -> int:
+        """Delete articles published before the cutoff (or undated and first seen before it)."""
+        cutoff = before.timestamp()
+        with self.lock:
+            deleted = self.conn.execute(
+                "DELETE FROM articles WHERE coalesce(published_at, first_seen) < ?",
+                (cutoff,),
+            ).rowcount
+            self.conn.commit()
+        return deleted
+
+    def _select_in(self, sql: str, values: List[str], *params) -> List[tuple]:
+        rows: List[tuple] = []
+        # Stay well below SQLite's bound-parameter limit.
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+            query = sql.format(",".join("?" * len(chunk)))
+            rows.extend(self.conn.execute(query, (*params, *chunk)).fetchall())
+        return rows
+
+
+@dataclass
+class ClusterState:
+    headlines: List[str] # Headlines labelled by the last run
+    labels: np.ndarray # labels[i] is the cluster of headlines[i] (-1 is noise)
+    clusterer: Any # hdbscan.HDBSCAN fitted with prediction_data=True
+    fitted: int # Headlines in the last full fit
+    drift: int # Headlines added or dropped since the last full fit
+
+
+class ClusterCache(SqliteCache):
+    """Each feed profile's fitted clusterer and headline labels, for incremental runs.
+
+    States are keyed by profile and embedding model, and the clusterer is
+    pickled: a state that no longer unpickles is treated as missing.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cluster_state (
+            profile TEXT NOT NULL,
+            model TEXT NOT NULL,
+            headlines TEXT NOT NULL,
+            labels BLOB NOT NULL,
+            clusterer BLOB NOT NULL,
+            fitted INTEGER NOT NULL,
+            drift INTEGER NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (profile, model)
+        );
+    """
+
+    def get(self, profile: str, model: str) -> Optional[ClusterState]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT headlines, labels, clusterer, fitted, drift FROM cluster_state WHERE profile = ? AND model = ?",
+                (profile, model),
+            ).fetchone()
+        if row is None:
+            return None
+        headlines, labels, clusterer, fitted, drift = row
+        try:
+            clusterer = pickle.loads(clusterer)
+        except Exception:
+            return None
+        return ClusterState(
+            headlines=json.loads(headlines),
+            labels=np.frombuffer(labels, dtype=np.int64).copy(),
+            clusterer=clusterer,
+            fitted=fitted,
+            drift=drift,
+        )
+
+    def put(self, profile: str, model: str, state: ClusterState) -> None:
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cluster_state "
+                "(profile, model, headlines, labels, clusterer, fitted, drift, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    profile,
+                    model,
+                    json.dumps(state.headlines, ensure_ascii=False),
+                    np.asarray(state.labels, dtype=np.int64).tobytes(),
+                    pickle.dumps(state.clusterer, protocol=pickle.HIGHEST_PROTOCOL),
+                    state.fitted,
+                    state.drift,
+                    time.time(),
+                ),
+            )
+            self.conn.commit()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.conn.execute("DELETE FROM cluster_state")
+            self.conn.commit()
+
+
+class DigestState(SqliteCache):
+    """The top-headline fingerprint each feed profile's digests were last written with."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS digest_state (
+            profile TEXT PRIMARY KEY,
+            day TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            written_at REAL NOT NULL
+        );
+    """
+
+    def unchanged(self, profile: str, day: str, fingerprint: str) -> bool:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM digest_state WHERE profile = ? AND day = ? AND fingerprint = ?",
+                (profile, day, fingerprint),
+            ).fetchone()
+        return row is not None
+
+    def record(self, rows: Iterable[Tuple[str, str, str]]) -> None:
+        """Store (profile, day, fingerprint) rows for digests just written."""
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO digest_state (profile, day, fingerprint, written_at) VALUES (?, ?, ?, ?)",
+                [(profile, day, fingerprint, now) for profile, day, fingerprint in rows],
+            )
+            self.conn.commit()
@@ -23,6 +23,7 @@ class User:
     summary: Optional[str] = None # Collated Summary
     top_articles: Optional[Sequence[Article]] = None # Top Headlines
     morning_digest: Optional[str] = None # Final Webpage content
+    prompt_tokens: Optional[int] = None # Estimated tokens sent to the summariser
 
 @dataclass
 class Quote:
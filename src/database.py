@@ -1,13 +1,76 @@
+from functools import lru_cache
 import json
 import sqlite3
+import threading
 from pathlib import Path
-from typing import Optional, Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 from commons import Feed, User
-from ingester import Ingester
+from ingester import FEEDS
+
+KEYWORD_SEPARATOR = "\x1f" # char(31), joins a user's keywords in iter_users
 
 class Database:
-    """SQLite-backed user store for Morning Digest."""
+    """SQLite-backed user store for Morning Digest.
+
+    users holds one row per reader; user_feeds holds their feed keywords
+    (feed names or tags) in selection order.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            name TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_feeds (
+            username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            keyword TEXT NOT NULL,
+            PRIMARY KEY (username, position)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS user_feeds_keyword ON user_feeds (keyword)",
+    )
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL", # Readers don't block the writer
+        "PRAGMA synchronous = NORMAL", # Durable at checkpoints; safe with WAL
+        "PRAGMA cache_size = -16000", # 16 MiB page cache
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA foreign_keys = ON",
+    )
+    CACHED_STATEMENTS: int = 64 # Prepared statements kept per connection
+
+    # Fixed SQL strings, so sqlite3 reuses their prepared statements.
+    SELECT_USER = "SELECT 1 FROM users WHERE username = ?"
+    INSERT_USER = "INSERT INTO users (username, name) VALUES (?, ?)"
+    UPSERT_USER = (
+        "INSERT INTO users (username, name) VALUES (?, ?) "
+        "ON CONFLICT (username) DO UPDATE SET name = excluded.name"
+    )
+    UPDATE_USER = "UPDATE users SET name = coalesce(?, name) WHERE username = ?"
+    DELETE_USER = "DELETE FROM users WHERE username = ?"
+    INSERT_FEED = "INSERT INTO user_feeds (username, position, keyword) VALUES (?, ?, ?)"
+    INSERT_FEED_IF_USER = (
+        "INSERT INTO user_feeds (username, position, keyword) "
+        "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM users WHERE username = ?)"
+    )
+    DELETE_FEEDS = "DELETE FROM user_feeds WHERE username = ?"
+    SELECT_USERS = """
+        SELECT u.username, u.name, (
+            SELECT group_concat(keyword, char(31)) FROM (
+                SELECT keyword FROM user_feeds AS f
+                WHERE f.username = u.username
+                ORDER BY f.position
+            )
+        )
+        FROM users AS u
+        ORDER BY u.rowid
+    """
+    BATCH_SIZE: int = 1000 # Rows fetched per round trip by iter_users
+    RESOLVE_CACHE: int = 4096 # Distinct feed selections kept resolved
 
     @staticmethod
     def serialise_feeds(feeds: Sequence[str]) -> str:
@@ -17,30 +80,74 @@ class Database:
     def deserialise_feeds(payload: str) -> Sequence[str]:
         return json.loads(payload)
 
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def keyword_index() -> Dict[str, Tuple[Feed, ...]]:
+        """Map every feed name and tag to its feeds, in FEEDS order."""
+        index: Dict[str, List[Feed]] = {}
+        for feed in FEEDS:
+            for keyword in dict.fromkeys([feed.name, *feed.tags]):
+                index.setdefault(keyword, []).append(feed)
+        return {keyword: tuple(feeds) for keyword, feeds in index.items()}
+
+    @staticmethod
+    @lru_cache(maxsize=RESOLVE_CACHE)
+    def resolve_feeds(keywords: Tuple[str, ...]) -> Sequence[Feed]:
+        """Same result as Ingester.match_feeds; readers with the same selection share it."""
+        index = Database.keyword_index()
+        matched: Dict[str, Feed] = {}
+        for keyword in keywords:
+            for feed in index.get(keyword, ()):
+                matched.setdefault(feed.name, feed)
+        return tuple(matched.values())
+
     def __init__(self, path: str = "data/users.db") -> None:
         self.db_path = Path(path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(self.db_path)
-        self.cursor = self.conn.cursor()
+        # Shared by the pipeline's threads; every use goes through self.lock.
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=self.CACHED_STATEMENTS)
+        for pragma in self.PRAGMAS:
+            self.conn.execute(pragma)
         self.create()
 
     def create(self) -> None:
-        self.cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                selected_feeds TEXT NOT NULL
+        with self.lock:
+            if self._has_json_column():
+                self._migrate_json_feeds()
+            for statement in self.SCHEMA:
+                self.conn.execute(statement)
+
+    def _has_json_column(self) -> bool:
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(users)")}
+        return "selected_feeds" in columns
+
+    def _migrate_json_feeds(self) -> None:
+        """Move the old users.selected_feeds JSON column into user_feeds rows."""
+        rows = self.conn.execute("SELECT username, name, selected_feeds FROM users ORDER BY rowid").fetchall()
+        self.conn.execute("BEGIN") # One transaction, DDL included
+        try:
+            self.conn.execute("ALTER TABLE users RENAME TO users_json")
+            for statement in self.SCHEMA:
+                self.conn.execute(statement)
+            self.conn.executemany(self.INSERT_USER, ((username, name) for username, name, _feeds in rows))
+            self.conn.executemany(
+                self.INSERT_FEED,
+                (
+                    row
+                    for username, _name, feeds in rows
+                    for row in self._feed_rows(username, self.deserialise_feeds(feeds))
+                ),
             )
-            """
-        )
-    
+            self.conn.execute("DROP TABLE users_json")
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
     def is_present(self, username: str) -> bool:
-        cursor = self.conn.execute(
-            "SELECT 1 FROM users WHERE username = ?",
-            (username,),
-        )
-        row = cursor.fetchone()
+        with self.lock:
+            row = self.conn.execute(self.SELECT_USER, (username,)).fetchone()
         return row is not None
 
     def add(
@@ -49,47 +156,88 @@ class Database:
         name: str,
         selected_feeds: Sequence[str],
     ) -> None:
-        if self.is_present(username):
-            raise ValueError(f"User with username '{username}' already exists.")
-        serialized_feeds = self.serialise_feeds(selected_feeds)
-        self.cursor.execute(
-            "INSERT INTO users (username, name, selected_feeds) VALUES (?, ?, ?)",
-            (username, name, serialized_feeds),
-        )
-        self.conn.commit()
+        with self.lock, self.conn:
+            try:
+                self.conn.execute(self.INSERT_USER, (username, name))
+            except sqlite3.IntegrityError:
+                raise ValueError(f"User with username '{username}' already exists.") from None
+            self.conn.executemany(self.INSERT_FEED, self._feed_rows(username, selected_feeds))
+
+    def add_many(self, users: Iterable[Tuple[str, str, Sequence[str]]]) -> int:
+        """Insert or update (username, name, selected_feeds) records in one transaction.
+
+        Existing usernames keep their position in iteration order and have
+        their name and feeds replaced. A username repeated in the batch takes
+        its last record. Returns the number of users written.
+        """
+        users = list({username: (username, name, feeds) for username, name, feeds in users}.values())
+        with self.lock, self.conn:
+            self.conn.executemany(self.UPSERT_USER, ((username, name) for username, name, _feeds in users))
+            self.conn.executemany(self.DELETE_FEEDS, ((username,) for username, _name, _feeds in users))
+            self.conn.executemany(
+                self.INSERT_FEED,
+                (row for username, _name, feeds in users for row in self._feed_rows(username, feeds)),
+            )
+        return len(users)
 
     def delete(self, username: str) -> None:
-        self.cursor.execute(
-            "DELETE FROM users WHERE username = ?",
-            (username,),
-        )
-        self.conn.commit()
+        # user_feeds rows go with it (ON DELETE CASCADE)
+        with self.lock, self.conn:
+            self.conn.execute(self.DELETE_USER, (username,))
 
     def update(self, username: str, name: Optional[str] = None, selected_feeds: Optional[Sequence[str]] = None) -> None:
-        if not self.is_present(username):
+        if self.update_many([(username, name, selected_feeds)]) == 0:
             raise ValueError(f"User with username '{username}' does not exist.")
-        if name is not None:
-            self.cursor.execute(
-                "UPDATE users SET name = ? WHERE username = ?",
-                (name, username),
+
+    def update_many(self, updates: Iterable[Tuple[str, Optional[str], Optional[Sequence[str]]]]) -> int:
+        """Apply (username, name, selected_feeds) updates in one transaction.
+
+        None leaves that field unchanged; unknown usernames are skipped.
+        Updates to the same username apply in order, so each field takes its
+        last non-None value. Returns the number of users found.
+        """
+        merged: Dict[str, Tuple[Optional[str], Optional[Sequence[str]]]] = {}
+        for username, name, feeds in updates:
+            previous_name, previous_feeds = merged.get(username, (None, None))
+            merged[username] = (
+                previous_name if name is None else name,
+                previous_feeds if feeds is None else feeds,
             )
-        if selected_feeds is not None:
-            serialized_feeds = self.serialise_feeds(selected_feeds)
-            self.cursor.execute(
-                "UPDATE users SET selected_feeds = ? WHERE username = ?",
-                (serialized_feeds, username),
+        updates = [(username, name, feeds) for username, (name, feeds) in merged.items()]
+        with self.lock, self.conn:
+            found = self.conn.executemany(self.UPDATE_USER, ((name, username) for username, name, _feeds in updates)).rowcount
+            replaced = [(username, feeds) for username, _name, feeds in updates if feeds is not None]
+            self.conn.executemany(self.DELETE_FEEDS, ((username,) for username, _feeds in replaced))
+            self.conn.executemany(
+                self.INSERT_FEED_IF_USER,
+                (
+                    (*row, username)
+                    for username, feeds in replaced
+                    for row in self._feed_rows(username, feeds)
+                ),
             )
-        self.conn.commit()
+        return found
+
+    @staticmethod
+    def _feed_rows(username: str, selected_feeds: Sequence[str]) -> Iterator[Tuple[str, int, str]]:
+        return ((username, position, keyword) for position, keyword in enumerate(selected_feeds))
+
+    def iter_users(self, batch_size: int = BATCH_SIZE) -> Iterator[User]:
+        """Stream users in insertion order, fetching batch_size rows at a time."""
+        # Keywords come back as one separator-joined string per user, so the
+        # per-user Python work is a row unpack and a cache lookup.
+        # The lock is held per batch, never across a yield.
+        with self.lock:
+            cursor = self.conn.execute(self.SELECT_USERS)
+        resolve = self.resolve_feeds
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for username, name, keywords in rows:
+                selection = tuple(keywords.split(KEYWORD_SEPARATOR)) if keywords else ()
+                yield User(username=username, name=name, selected_feeds=resolve(selection))
 
     def get_all(self) -> Sequence[User]:
-        self.cursor.execute("SELECT username, name, selected_feeds FROM users")
-        rows = self.cursor.fetchall()
-        users = []
-        for row in rows:
-            username, name, selected_feeds_json = row
-            selected_feeds_json: Sequence[str] = self.deserialise_feeds(selected_feeds_json)
-            selected_feeds: Sequence[Feed] = Ingester.match_feeds(selected_feeds_json)
-            user: User = User(username=username, name=name, selected_feeds=selected_feeds)
-            users.append(user)
-        return users
-    
\ No newline at end of file
+        return list(self.iter_users())
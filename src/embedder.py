@@ -0,0 +1,111 @@
+"""embedder.py
+
+Interchangeable headline embedding backends for TopExtractor.
+
+    sentence-transformers   all-MiniLM-L6-v2 through PyTorch (default)
+    onnx                    the same model's ONNX export on ONNX Runtime
+    onnx-int8               the int8-quantised ONNX export, smallest and fastest on CPU
+
+The ONNX backends need onnxruntime, tokenizers and huggingface_hub but not torch.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class EmbeddingBackend(ABC):
+    """Turns texts into an (n, d) array of L2-normalised float32 embeddings."""
+
+    name: str = ""
+
+    @abstractmethod
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+
+    def __init__(self, model_name: str) -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        return self.model.encode(list(texts), show_progress_bar=False)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """Runs the model's ONNX export with the same mean pooling and normalisation."""
+
+    MAX_LENGTH: int = 256 # all-MiniLM-L6-v2 max_seq_length
+    BATCH_SIZE: int = 32
+    MODEL_FILE: str = "onnx/model.onnx"
+    QUANTISED_MODEL_FILE: str = "onnx/model_quint8_avx2.onnx"
+
+    def __init__(self, model_name: str, quantised: bool = False, model_file: Optional[str] = None) -> None:
+        try:
+            import onnxruntime
+            from huggingface_hub import hf_hub_download
+            from tokenizers import Tokenizer
+        except ImportError as exc:
+            raise ImportError("The ONNX embedding backend needs onnxruntime, tokenizers and huggingface_hub.") from exc
+
+        model_file = model_file or (self.QUANTISED_MODEL_FILE if quantised else self.MODEL_FILE)
+        self.name = backend_name("onnx-int8" if quantised else "onnx", model_name)
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(model_name, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.MAX_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            hf_hub_download(model_name, model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    @staticmethod
+    def mean_pool(hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        batches: List[np.ndarray] = []
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            encodings = self.tokenizer.encode_batch(list(texts[start:start + self.BATCH_SIZE]))
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+            batches.append(self.mean_pool(hidden, inputs["attention_mask"]))
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.concatenate(batches)
+
+
+BACKENDS: Dict[str, Callable[[str], EmbeddingBackend]] = {
+    "sentence-transformers": SentenceTransformerBackend,
+    "onnx": lambda model_name: OnnxBackend(model_name),
+    "onnx-int8": lambda model_name: OnnxBackend(model_name, quantised=True),
+}
+
+
+def backend_name(kind: str, model_name: str) -> str:
+    """The name make_backend(kind, model_name) would carry, without loading anything."""
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{kind}'. Choose one of: {', '.join(BACKENDS)}.")
+    return model_name if kind == "sentence-transformers" else f"{model_name}:{kind}"
+
+
+def make_backend(kind: str, model_name: str) -> EmbeddingBackend:
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{kind}'. Choose one of: {', '.join(BACKENDS)}.")
+    return BACKENDS[kind](model_name)
@@ -0,0 +1,136 @@
+"""http_client.py
+
+One pooled HTTP client shared by every outbound call: feeds, the daily quote
+and the OpenAI API. Connections to the same host are kept alive and reused
+(over HTTP/2 when h2 is installed and the server offers it), host lookups are
+cached, and timeouts and connect retries are configured in one place.
+"""
+
+import importlib.util
+import socket
+import threading
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import httpcore
+import httpx
+# Private, and pinned with httpx in requirements.txt; test_http_client covers it.
+from httpx._utils import get_environment_proxies
+
+
+class DnsCache:
+    """Caches getaddrinfo results per (host, port) for TTL seconds."""
+
+    TTL: float = 300.0
+
+    _entries: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def resolve(host: str, port: int) -> List[str]:
+        key = (host, port)
+        now = time.monotonic()
+        with DnsCache._lock:
+            entry = DnsCache._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos)) # Keep resolver order
+        with DnsCache._lock:
+            DnsCache._entries[key] = (now + DnsCache.TTL, addresses)
+        return addresses
+
+    @staticmethod
+    def clear() -> None:
+        with DnsCache._lock:
+            DnsCache._entries.clear()
+
+
+class CachingNetworkBackend(httpcore.SyncBackend):
+    """Connects to cached addresses; TLS still verifies the original host name."""
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addresses = DnsCache.resolve(host, port)
+        except socket.gaierror:
+            addresses = [host] # Let httpcore raise its usual ConnectError
+        error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return super().connect_tcp(address, port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as exc:
+                error = exc
+        raise error
+
+
+class HttpClient:
+
+    TIMEOUT: float = 10.0 # Default per-request timeout in seconds
+    CONNECT_TIMEOUT: float = 5.0
+    RETRIES: int = 2 # Connection attempts retried on connect errors
+    MAX_CONNECTIONS: int = 32
+    MAX_KEEPALIVE: int = 16
+    KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2: bool = importlib.util.find_spec("h2") is not None
+
+    _client: Optional[httpx.Client] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def shared() -> httpx.Client:
+        """Return the process-wide client, creating it on first use."""
+        if HttpClient._client is None:
+            with HttpClient._lock:
+                if HttpClient._client is None:
+                    HttpClient._client = HttpClient.create()
+        return HttpClient._client
+
+    @staticmethod
+    def transport(proxy: Optional[str] = None) -> httpx.HTTPTransport:
+        return httpx.HTTPTransport(
+            http2=HttpClient.HTTP2,
+            retries=HttpClient.RETRIES,
+            proxy=proxy,
+            limits=httpx.Limits(
+                max_connections=HttpClient.MAX_CONNECTIONS,
+                max_keepalive_connections=HttpClient.MAX_KEEPALIVE,
+                keepalive_expiry=HttpClient.KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    @staticmethod
+    def create() -> httpx.Client:
+        transport = HttpClient.transport()
+        # httpx has no public hook for the network backend. If a later httpcore
+        # drops this attribute, the client resolves hosts per connection.
+        pool = getattr(transport, "_pool", None)
+        if isinstance(pool, httpcore.ConnectionPool) and hasattr(pool, "_network_backend"):
+            pool._network_backend = CachingNetworkBackend()
+        # With an explicit transport httpx stops reading HTTP(S)_PROXY, ALL_PROXY
+        # and NO_PROXY, so mount them as it would: None sends a host direct.
+        mounts = {
+            pattern: None if proxy is None else HttpClient.transport(proxy=proxy)
+            for pattern, proxy in get_environment_proxies().items()
+        }
+        return httpx.Client(
+            transport=transport,
+            mounts=mounts,
+            timeout=httpx.Timeout(HttpClient.TIMEOUT, connect=HttpClient.CONNECT_TIMEOUT),
+            follow_redirects=True,
+        )
+
+    @staticmethod
+    def get(
+        url: str,
+        timeout: Optional[float] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> httpx.Response:
+        kwargs = {} if timeout is None else {"timeout": httpx.Timeout(timeout, connect=min(timeout, HttpClient.CONNECT_TIMEOUT))}
+        return HttpClient.shared().get(url, headers=headers, **kwargs)
+
+    @staticmethod
+    def close() -> None:
+        with HttpClient._lock:
+            if HttpClient._client is not None:
+                HttpClient._client.close()
+                HttpClient._client = None
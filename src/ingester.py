@@ -1,8 +1,13 @@
-from typing import Any, List, Sequence, Set
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Set, Tuple
+import time
 import feedparser
 
+from cache import ArticleStore, CachedFeed, FeedCache
 from commons import Article, Feed
-from datetime import datetime, timezone, timedelta
+from http_client import HttpClient
+from datetime import datetime, time as dtime, timezone, timedelta
 from email.utils import parsedate_to_datetime
 
 FEEDS: List[Feed] = [
@@ -95,13 +100,38 @@ FEEDS: List[Feed] = [
 ]
 
 
+@dataclass
+class FeedResult:
+    feed: Feed # Feed that was fetched
+    articles: Sequence[Article] # Articles kept after date filtering
+    elapsed: float # Seconds spent fetching and parsing
+    error: Optional[str] = None # Failure reason, None on success
+    new_articles: Optional[int] = None # Articles new or changed since the last run (with a store)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
 class Ingester:
 
+    MAX_WORKERS: int = 16 # Feeds fetched concurrently
+    TIMEOUT: float = 10.0 # Per-feed HTTP timeout in seconds
+    RETENTION: timedelta = timedelta(days=7) # How long the article store keeps articles
+
     @staticmethod
     def get_allowed_dates() -> Set[datetime.date]:
         now = datetime.now(timezone.utc)
         return {now.date(), (now - timedelta(days=1)).date()}
 
+    @staticmethod
+    def window_bounds() -> Tuple[datetime, datetime]:
+        """[since, until) covering every allowed date, for ArticleStore.window."""
+        dates = Ingester.get_allowed_dates()
+        since = datetime.combine(min(dates), dtime.min, tzinfo=timezone.utc)
+        until = datetime.combine(max(dates), dtime.min, tzinfo=timezone.utc) + timedelta(days=1)
+        return since, until
+
     @staticmethod
     def format_article(entry: Any) -> str:
         title = (entry.get("title") or "").strip()
@@ -116,9 +146,38 @@ class Ingester:
         )
 
     @staticmethod
-    def fetch_feed(url: str) -> Sequence[Article]:
-        parsed = feedparser.parse(url)
+    def conditional_headers(cached: Optional[CachedFeed]) -> dict[str, str]:
+        if cached is None:
+            return {}
+        headers: dict[str, str] = {}
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    @staticmethod
+    def fetch_feed(
+        url: str,
+        timeout: float = TIMEOUT,
+        cache: Optional[FeedCache] = None,
+    ) -> Sequence[Article]:
+        cached = cache.get(url) if cache is not None else None
+        headers = Ingester.conditional_headers(cached)
+        response = HttpClient.get(url, timeout=timeout, headers=headers)
+        if cached is not None and response.status_code == 304:
+            # Unchanged since the cached copy: reuse it without parsing.
+            return cached.articles
+        response.raise_for_status()
+        parsed = feedparser.parse(response.content)
         articles: List[Article] = [Ingester.format_article(entry) for entry in parsed.entries]
+        if cache is not None:
+            cache.put(
+                url,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                articles=articles,
+            )
         return articles
 
 
@@ -142,12 +201,54 @@ class Ingester:
         return filtered
 
     @staticmethod
-    def populate_feeds() -> None:
-        for feed in FEEDS:
-            # Logic to fetch and populate feed.result
-            articles: Sequence[Article] = Ingester.fetch_feed(feed.url)
-            today_articles: Sequence[Article] = Ingester.filter_today_articles(articles)
-            feed.article = today_articles
+    def ingest_feed(
+        feed: Feed,
+        timeout: float = TIMEOUT,
+        cache: Optional[FeedCache] = None,
+        store: Optional[ArticleStore] = None,
+    ) -> FeedResult:
+        start = time.perf_counter()
+        try:
+            articles: Sequence[Article] = Ingester.fetch_feed(feed.url, timeout=timeout, cache=cache)
+            if store is None:
+                today_articles: Sequence[Article] = Ingester.filter_today_articles(articles)
+                return FeedResult(feed, today_articles, time.perf_counter() - start)
+            # Keep everything the feed carried; read back only the allowed window,
+            # which also covers items that have since dropped off the feed.
+            new_articles = store.upsert(feed.name, articles)
+            today_articles = store.window(feed.name, *Ingester.window_bounds())
+        except Exception as exc:
+            return FeedResult(feed, [], time.perf_counter() - start, f"{type(exc).__name__}: {exc}")
+        return FeedResult(feed, today_articles, time.perf_counter() - start, new_articles=len(new_articles))
+
+    @staticmethod
+    def populate_feeds(
+        feeds: Optional[Sequence[Feed]] = None,
+        max_workers: int = MAX_WORKERS,
+        timeout: float = TIMEOUT,
+        cache: Optional[FeedCache] = None,
+        store: Optional[ArticleStore] = None,
+    ) -> Sequence[FeedResult]:
+        """Fetch every feed on a bounded thread pool and attach its articles.
+
+        A failed or timed-out feed is reported in its FeedResult and left with
+        an empty article list, so it never aborts the rest of the run. With a
+        cache, unchanged feeds are revalidated with a conditional GET. With a
+        store, articles persist across runs and each feed gets its window from it.
+        """
+        feeds = FEEDS if feeds is None else feeds
+        workers = max(1, min(max_workers, len(feeds) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda feed: Ingester.ingest_feed(feed, timeout, cache, store), feeds))
+        for result in results:
+            result.feed.article = result.articles
+            if not result.ok:
+                print(f"⚠️  Skipped feed {result.feed.name}: {result.error}")
+        if store is not None:
+            pruned = store.prune(datetime.now(timezone.utc) - Ingester.RETENTION)
+            new = sum(result.new_articles or 0 for result in results)
+            print(f"🗞️  Article store: {new} new or changed article(s), {pruned} expired")
+        return results
 
     @staticmethod
     def match_feeds(selected_feeds: Sequence[str]) -> Sequence[Feed]:
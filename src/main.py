@@ -4,15 +4,20 @@ Run the Morning Digest pipeline end-to-end: ingest, summarise, and publish.
 """
 
 import argparse
+from datetime import date, datetime, timezone
 import sys
+import threading
+import time
 from pathlib import Path
 from typing import List, Optional, Sequence
 
+from cache import ArticleStore, ClusterCache, DigestState, EmbeddingCache, FeedCache, ResponseCache
 from commons import User
 from database import Database
 from ingester import FEEDS, Ingester
-from organiser import Organiser
-from summariser import Summariser
+from organiser import LOGO_MODES, Organiser, WorkerReport, WriteResult
+from profiles import Profile, Profiles
+from summariser import SUMMARY_MODES, Summariser
 from top_extractor import TopExtractor
 
 
@@ -21,32 +26,81 @@ class DigestApp:
 
     DEFAULT_USERNAME = "default_user"
     DEFAULT_NAME = "Singapore"
+    CACHE_PATH = "data/cache.db"
 
     def __init__(self) -> None:
         self.parser = self._build_parser()
         self.db = Database()
+        self.feed_cache = FeedCache(self.CACHE_PATH)
+        self.article_store = ArticleStore(self.CACHE_PATH)
+        self.embedding_cache = EmbeddingCache(self.CACHE_PATH)
+        self.response_cache = ResponseCache(self.CACHE_PATH)
+        self.cluster_cache = ClusterCache(self.CACHE_PATH)
+        self.digest_state = DigestState(self.CACHE_PATH)
         self.ingester = Ingester()
-        self.summariser = Summariser()
+        self.summariser = Summariser(cache=self.response_cache, embedder=self._embed_headlines)
         self.top_extractor = TopExtractor()
 
     def run(self, argv: Optional[List[str]] = None) -> None:
         args = self.parser.parse_args(argv)
+        self.response_cache.bypass = args.no_llm_cache
+        self.summariser.mode = args.summary_mode
+        self.summariser.stream = args.stream
+        if args.warm_up:
+            # Load the embedding model in the background while feeds download.
+            threading.Thread(target=self.top_extractor.warm_up, daemon=True).start()
         self._ensure_default_user()
-        self.ingester.populate_feeds()
-
-        users = list(self.db.get_all())
-        if not users:
+        self.ingester.populate_feeds(cache=self.feed_cache, store=self.article_store)
+        pruned = self.embedding_cache.prune(datetime.now(timezone.utc) - self.embedding_cache.TTL)
+        print(f"🧠 Embedding cache: {pruned} unused vector(s) expired")
+
+        # Readers with the same feeds are ranked and summarised once, as a profile.
+        # Users are streamed from the database straight into their profiles.
+        profiles = Profiles.group(self.db.iter_users())
+        if not profiles:
             print("No users found. Add at least one user to proceed.")
             return
-
-        print(f"Generating digests for {len(users)} user(s)")
-        self.top_extractor.pick_top_articles(users)
-        self.summariser.summarise(users)
-        
-        for user in users:
-            output_path = self._output_path(args.output, user)
-            Organiser.build(user=user, output_file=output_path)
-            print(f"✉️  Built digest for {user.name or user.username} -> {output_path}")
+        readers = Profiles.readers(profiles)
+        users = sum(len(profile.members) for profile in profiles)
+        print(f"Generating digests for {users} user(s) across {len(profiles)} feed profile(s)")
+        if not args.incremental:
+            self.cluster_cache.clear() # A full run refits every profile
+        self.top_extractor.pick_top_articles(readers, cache=self.embedding_cache, clusters=self.cluster_cache)
+        self._report_embedding_cache()
+        day = date.today().isoformat()
+        if args.incremental:
+            # Only profiles whose top headlines changed are summarised and rendered again.
+            stale = [profile for profile in profiles if not self._is_current(profile, day, args.output)]
+            print(f"♻️  {len(profiles) - len(stale)} profile(s) unchanged since the last run, {len(stale)} to rebuild")
+            if not stale:
+                return
+            profiles = stale
+            readers = Profiles.readers(profiles)
+        if args.stream:
+            # Render and write each digest as soon as its summary arrives.
+            ready = Profiles.fan_out(profiles, self.summariser.summarise_iter(readers))
+        else:
+            self.summariser.summarise(readers)
+            ready = Profiles.fan_out(profiles, readers)
+
+        # Quote, logo and header fragments are shared by every digest in the run.
+        context = Organiser.render_context(logo_mode=args.logo, output_dir=str(Path(args.output).parent))
+        if args.workers > 1:
+            start = time.perf_counter()
+            jobs = ((self._output_path(args.output, user), user) for user in ready)
+            results, reports = Organiser.render_parallel(jobs, context, workers=args.workers)
+            self._report_writes(results)
+            self._report_workers(reports, time.perf_counter() - start)
+        else:
+            # Render on this thread; files are written on a pool as each digest is ready.
+            outputs = (
+                (self._output_path(args.output, user), Organiser.render(user, context))
+                for user in ready
+            )
+            results = Organiser.write_many(outputs)
+            self._report_writes(results)
+        self._record_digests(profiles, day, args.output, results)
+        self._report_response_cache()
 
     # ------------------------------------------------------------------
     # Argument parsing
@@ -60,6 +114,44 @@ class DigestApp:
             default="output/morning_digest.md",
             help="Base output Markdown file path",
         )
+        parser.add_argument(
+            "--warm-up",
+            action="store_true",
+            help="Preload the embedding model while feeds are being fetched",
+        )
+        parser.add_argument(
+            "--no-llm-cache",
+            action="store_true",
+            help="Ignore cached LLM responses (fresh responses are still cached)",
+        )
+        parser.add_argument(
+            "--summary-mode",
+            choices=SUMMARY_MODES,
+            default="direct",
+            help="'map-reduce' summarises each feed once and builds digests from those notes",
+        )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help="Stream model output and build each digest as soon as its summary completes",
+        )
+        parser.add_argument(
+            "--logo",
+            choices=LOGO_MODES,
+            default="external",
+            help="'external' links a resized, content-hashed logo file; 'inline' embeds it (for email)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Render and write digests across N processes",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Intra-day refresh: update the last run's clusters and rebuild only digests whose top headlines changed",
+        )
         return parser
 
     # ------------------------------------------------------------------
@@ -78,6 +170,59 @@ class DigestApp:
     def _all_feed_names() -> Sequence[str]:
         return [feed.name for feed in FEEDS]
 
+    def _is_current(self, profile: Profile, day: str, output: str) -> bool:
+        """True if every member's digest exists and was written today from the same top headlines."""
+        if not self.digest_state.unchanged(Profiles.state_key(profile.key), day, profile.fingerprint()):
+            return False
+        return all(Path(self._output_path(output, user)).exists() for user in profile.members)
+
+    def _record_digests(self, profiles: Sequence[Profile], day: str, output: str, results: Sequence[WriteResult]) -> None:
+        """Remember the top headlines of profiles whose summary and every digest made it to disk.
+
+        A profile whose summary failed is left unrecorded, so the next
+        incremental run retries it.
+        """
+        written = {result.path for result in results}
+        self.digest_state.record(
+            (Profiles.state_key(profile.key), day, profile.fingerprint())
+            for profile in profiles
+            if profile.reader.summary
+            and all(self._output_path(output, user) in written for user in profile.members)
+        )
+
+    def _embed_headlines(self, texts: Sequence[str]):
+        return TopExtractor.embed(texts, cache=self.embedding_cache)
+
+    def _report_embedding_cache(self) -> None:
+        cache = self.embedding_cache
+        print(f"🧠 Embedding cache: {cache.hits} hit(s), {cache.misses} miss(es) ({cache.hit_rate:.0%})")
+
+    @staticmethod
+    def _report_writes(results: Sequence[WriteResult]) -> None:
+        for result in results:
+            if result.unchanged:
+                print(f"✉️  Unchanged {result.path} ({result.elapsed * 1000:.1f} ms)")
+            else:
+                print(f"✉️  Wrote {result.path} ({result.bytes_written:,} B, {result.elapsed * 1000:.1f} ms)")
+        written = [result for result in results if not result.unchanged]
+        total = sum(result.bytes_written for result in written)
+        print(f"🗂️  {len(written)} digest(s) written ({total:,} B), {len(results) - len(written)} unchanged")
+
+    @staticmethod
+    def _report_workers(reports: Sequence[WorkerReport], elapsed: float) -> None:
+        for report in reports:
+            print(
+                f"⚙️  Worker {report.pid}: {report.digests} digest(s), {report.bytes_written:,} B, "
+                f"render {report.render_time:.2f}s, write {report.write_time:.2f}s"
+            )
+        digests = sum(report.digests for report in reports)
+        rate = digests / elapsed if elapsed else 0.0
+        print(f"⚙️  {len(reports)} worker(s) built {digests} digest(s) in {elapsed:.2f}s ({rate:,.0f}/s)")
+
+    def _report_response_cache(self) -> None:
+        cache = self.response_cache
+        print(f"💬 LLM response cache: {cache.hits} hit(s), {cache.misses} miss(es) ({cache.hit_rate:.0%})")
+
     # ------------------------------------------------------------------
     # Output helpers
     # ------------------------------------------------------------------
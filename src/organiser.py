@@ -1,15 +1,26 @@
 """Compose the Morning Digest output using rounded boxes and a centered header."""
 
 import base64
+import hashlib
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-import requests
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+from markupsafe import Markup
 
-from commons import Quote, User
+from commons import Article, Quote, User
+from http_client import HttpClient
+
+
+LOGO_MODES = ("external", "inline") # external: hashed asset file; inline: base64 data URI (email)
 
 
 @dataclass(frozen=True)
@@ -17,6 +28,36 @@ class Headline:
     title: str
     url: str
 
+@dataclass(frozen=True)
+class RenderContext:
+    """Fragments shared by every digest in a run, rendered once and marked safe."""
+    style_block: Markup
+    logo_html: Markup
+    date_html: Markup
+    sponsor_html: Markup
+    quote_html: Markup
+    translations_html: Markup
+
+@dataclass(frozen=True)
+class WriteResult:
+    path: str
+    bytes_written: int # 0 when skipped
+    elapsed: float # Seconds
+    unchanged: bool = False # Identical to the file already on disk
+
+@dataclass
+class WorkerReport:
+    """Render and write totals of one --workers process."""
+    pid: int
+    digests: int = 0
+    bytes_written: int = 0
+    render_time: float = 0.0 # Seconds
+    write_time: float = 0.0 # Seconds
+
+# A chunk sent to a render worker: the distinct (title, url) pairs of its users,
+# then one (output_file, name, summary, headline indices) row per user.
+RenderChunk = Tuple[List[Tuple[str, str]], List[Tuple[str, str, str, Tuple[int, ...]]]]
+
 @dataclass(frozen=True)
 class DigestContent:
     name: str
@@ -30,18 +71,33 @@ class Organiser:
     """Create a one-page digest using modular rounded sections."""
 
     LOGO_PATH: str = "img/MorningDigest.png" 
+    LOGO_WIDTH: int = 360 # 2x the 180px display width
+    ASSET_DIR: str = "assets" # Relative to the digest files
+    WRITE_WORKERS: int = 8
+    RENDER_CHUNK: int = 64 # Users per task sent to a render process
     SPONSOR_NAME: str = "Choonyong Chan"
     SPONSOR_MESSAGE: str = "❤️ This edition is made possible by friends of The Morning Digest."
     PARTNERSHIP_MESSAGE: str = "📬 Forward this digest to someone who should wake up informed."
     EN_CHINESE_TRANSLATION_LINK: str = "https://choonyongchan-github-io.translate.goog/MorningDigest/?_x_tr_sl=en&_x_tr_tl=zh-CN"
     EN_MALAY_TRANSLATION_LINK: str = "https://choonyongchan-github-io.translate.goog/MorningDigest/?_x_tr_sl=en&_x_tr_tl=ms"
     EN_TAMIL_TRANSLATION_LINK: str = "https://choonyongchan-github-io.translate.goog/MorningDigest/?_x_tr_sl=en&_x_tr_tl=ta"
+    TEMPLATE_DIR: Path = Path(__file__).parent / "templates"
+    DIGEST_TEMPLATE: str = "digest.html"
+
+    # Templates are compiled on first use and reused for every digest in the process.
+    _environment: Optional[Environment] = None
+    _digest_template: Optional[Template] = None
 
     @staticmethod
     def build(
         user: User,
         output_file: str,
+        context: Optional[RenderContext] = None,
     ) -> None:
+        Organiser._write(output_file, Organiser.render(user, context))
+
+    @staticmethod
+    def render(user: User, context: Optional[RenderContext] = None) -> str:
         top_headlines = Organiser.build_top_headlines(user)
         content = DigestContent(
             name=user.name,
@@ -51,62 +107,71 @@ class Organiser:
             partnership_message=Organiser.PARTNERSHIP_MESSAGE,
             top_headlines=top_headlines,
         )
-        markdown_text = Organiser._compose_markdown(content)
-        Organiser._write(output_file, markdown_text)
+        return Organiser._compose_markdown(content, context)
 
     # ------------------------------------------------------------------
     # Rendering helpers
     # ------------------------------------------------------------------
     @staticmethod
-    def _compose_markdown(content: DigestContent) -> str:
+    def render_context(
+        sponsor_name: str = SPONSOR_NAME,
+        logo_mode: str = "external",
+        output_dir: str = "output",
+    ) -> RenderContext:
+        """Fetch the quote, prepare the logo and pre-build the shared header fragments."""
+        if logo_mode not in LOGO_MODES:
+            raise ValueError(f"Unknown logo mode '{logo_mode}'. Choose one of: {', '.join(LOGO_MODES)}.")
         quote = Organiser.get_daily_quote()
-        header = Organiser.build_header(content.name, content.sponsor_name, quote)
-        sections = [
-            Organiser._rounded_box(f"Good Morning {content.name}", Organiser.build_good_morning(content.summary)),
-            Organiser._rounded_box(f"Presented by {content.sponsor_name}", Organiser.build_sponsor(content.sponsor_message)),
-            Organiser._rounded_box("Top Headlines", Organiser.build_headlines(content.top_headlines)),
-            Organiser._rounded_box("Partnership + Share", Organiser.build_partnership_share(content.partnership_message)),
-        ]
-        return "\n\n".join(filter(None, [Organiser._style_block(), header, *sections]))
-
-    @staticmethod
-    def _style_block() -> str:
-        return (
-            "<style>\n"
-            "body { font-family: system-ui, -apple-system, Segoe UI, Roboto, Arial, sans-serif; margin: 0; padding: 24px; background: #f4f1ec; }\n"
-            ".digest-header { text-align: center; margin-bottom: 24px; }\n"
-            ".digest-header img { max-width: 180px; height: auto; display: block; margin: 0 auto 8px; }\n"
-            ".digest-header h1 { margin: 6px 0; font-size: 28px; }\n"
-            ".digest-header .sponsor-line { font-weight: 600; margin: 6px 0; }\n"
-            ".digest-header .quote-text { font-size: 18px; font-style: italic; margin: 12px 0 4px; }\n"
-            ".digest-header .quote-meta { color: #4b5d52; margin: 0; }\n"
-            ".digest-box { background: #e8f5e9; border-radius: 18px; padding: 18px 20px; margin: 18px 0; border: 1px solid #c8e6c9; box-shadow: 0 2px 4px rgba(0,0,0,0.05); }\n"
-            ".digest-box h3 { margin-top: 0; margin-bottom: 12px; color: #1b5e20; }\n"
-            ".digest-box ul { padding-left: 20px; margin: 0; }\n"
-            ".digest-box p { margin: 10px 0; line-height: 1.5; }\n"
-            ".headline-meta { display: block; font-size: 12px; color: #4b5d52; }\n"
-            "</style>"
+        logo_html = Organiser.build_logo() if logo_mode == "inline" else Organiser.publish_logo(output_dir)
+        macros = Organiser.macros()
+        return RenderContext(
+            style_block=Markup(Organiser.environment().get_template("style.html").render()),
+            logo_html=Markup(logo_html),
+            date_html=macros.date_line(datetime.now().strftime("%A, %d %B %Y")),
+            sponsor_html=macros.sponsor_line(sponsor_name),
+            quote_html=macros.quote(quote),
+            translations_html=macros.translations([
+                ("中文", Organiser.EN_CHINESE_TRANSLATION_LINK),
+                ("Bahasa Melayu", Organiser.EN_MALAY_TRANSLATION_LINK),
+                ("தமிழ்", Organiser.EN_TAMIL_TRANSLATION_LINK),
+            ]),
         )
-    
+
     @staticmethod
-    def _rounded_box(title: str, body_html: str) -> str:
-        return (
-            "<div class='digest-box'>\n"
-            f"<h3>{title}</h3>\n"
-            f"{body_html}\n"
-            "</div>"
-        )
-    
+    def environment() -> Environment:
+        if Organiser._environment is None:
+            Organiser._environment = Environment(
+                loader=FileSystemLoader(Organiser.TEMPLATE_DIR),
+                autoescape=select_autoescape(["html"]),
+                auto_reload=False, # No mtime check per get_template call
+            )
+        return Organiser._environment
+
+    @staticmethod
+    def digest_template() -> Template:
+        if Organiser._digest_template is None:
+            Organiser._digest_template = Organiser.environment().get_template(Organiser.DIGEST_TEMPLATE)
+        return Organiser._digest_template
+
+    @staticmethod
+    def macros():
+        return Organiser.environment().get_template("macros.html").module
+
     @staticmethod
-    def _paragraphs(paragraphs: List[str]) -> str:
-        return "\n".join(f"<p>{para}</p>" for para in paragraphs)
+    def _compose_markdown(content: DigestContent, context: Optional[RenderContext] = None) -> str:
+        context = context or Organiser.render_context(content.sponsor_name, logo_mode="inline")
+        return Organiser.digest_template().render(
+            content=content,
+            context=context,
+            summary=Organiser.summary_paragraphs(content.summary),
+        )
 
     @staticmethod
     def get_daily_quote() -> Quote:
         quote = "Keep going — small steps also reach Marina Bay."
         author = "Unknown"
         try:
-            response = requests.get("https://zenquotes.io/api/today", timeout=5)
+            response = HttpClient.get("https://zenquotes.io/api/today", timeout=5)
             response.raise_for_status()
             payload = response.json()
             quote = payload[0].get("q", quote).strip()
@@ -121,75 +186,36 @@ class Organiser:
         if not logo_path.exists():
             return "<h1 style='margin:0;'>The Morning Digest</h1>"
         encoded = base64.b64encode(logo_path.read_bytes()).decode("utf-8")
-        return (
-            "<img src='data:image/png;base64,"
-            f"{encoded}' alt='The Morning Digest Logo' />"
-        )
+        return Organiser.macros().logo(f"data:image/png;base64,{encoded}")
 
     @staticmethod
-    def build_header(user_name: str, sponsor_name: str, quote: Quote) -> str:
-        logo_html = Organiser.build_logo()
-        date_html = f"<p class='sponsor-line'>{datetime.now().strftime('%A, %d %B %Y')}</p>"
-        sponsor_html = f"<p class='sponsor-line'>Together with <strong>{sponsor_name}</strong></p>"
-        quote_html = (
-            "<div class='header-quote'>"
-            f"<p class='quote-text'>“{quote.quote}”</p>"
-            f"<p class='quote-meta'>— {quote.author}</p>"
-            "</div>"
-        )
-        translations_html = (
-            f"""<p class='quote-meta'>
-            <a href='{Organiser.EN_CHINESE_TRANSLATION_LINK}'>中文</a> |
-            <a href='{Organiser.EN_MALAY_TRANSLATION_LINK}'>Bahasa Melayu</a> |
-            <a href='{Organiser.EN_TAMIL_TRANSLATION_LINK}'>தமிழ்</a> 
-            </p>"""
-        )
-        name = "" if user_name == "Singapore" else f" for {user_name}"
-        return (
-            "<div class='digest-header'>\n"
-            f"{logo_html}\n"
-            f"<h1>The Morning Digest{name}</h1>\n"
-            f"{date_html}"
-            f"{sponsor_html}\n"
-            f"{quote_html}\n"
-            f"{translations_html}\n"
-            "</div>"
-        )
+    def publish_logo(output_dir: str) -> str:
+        """Write a resized WebP copy of the logo under a content-hashed name and link to it."""
+        logo_path = Path(Organiser.LOGO_PATH)
+        if not logo_path.exists():
+            return "<h1 style='margin:0;'>The Morning Digest</h1>"
+        from PIL import Image
+
+        with Image.open(logo_path) as image:
+            image.thumbnail((Organiser.LOGO_WIDTH, Organiser.LOGO_WIDTH))
+            buffer = io.BytesIO()
+            image.save(buffer, format="WEBP", quality=80, method=6)
+        data = buffer.getvalue()
+        name = f"MorningDigest-{hashlib.sha256(data).hexdigest()[:12]}.webp"
+        asset_path = Path(output_dir) / Organiser.ASSET_DIR / name
+        if not asset_path.exists():
+            Organiser._write_bytes(asset_path, data)
+        return Organiser.macros().logo(f"{Organiser.ASSET_DIR}/{name}")
 
     @staticmethod
-    def build_good_morning(summary: str) -> str:
+    def summary_paragraphs(summary: str) -> List[str]:
         text = (summary or "").strip()
         paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
-        if not paragraphs:
-            paragraphs = ["Summary is currently unavailable."]
-        return Organiser._paragraphs(paragraphs)
-
-    @staticmethod
-    def build_sponsor(message: str) -> str:
-        return Organiser._paragraphs([message])
+        return paragraphs or ["Summary is currently unavailable."]
 
     @staticmethod
     def build_headlines(headlines: List[Headline]) -> str:
-        if not headlines:
-            return "<p>No fresh headlines right now — check back soon.</p>"
-        items = []
-        for head in headlines:
-            items.append(
-                "<li>"
-                f"<a href='{head.url}'>{head.title}</a>"
-                "</li>"
-            )
-        return f"<ul>{''.join(items)}</ul>"
-
-    @staticmethod
-    def build_partnership_share(message: str) -> str:
-        parts = [
-            f"<p>{message}</p>",
-            "<p>🤝 Partner with us: <a href='#'>Submit a sponsorship enquiry →</a></p>",
-            "<p>✨ Share with a friend: forwarding is the best compliment.</p>",
-            "<p>🌏 Got a story? Tell us about SG or regional stories we should feature.</p>",
-        ]
-        return "\n".join(parts)
+        return Organiser.macros().headlines(headlines)
 
     # ------------------------------------------------------------------
     # Headlines aggregation
@@ -236,16 +262,129 @@ class Organiser:
     # IO helpers
     # ------------------------------------------------------------------
     @staticmethod
-    def _write(output_file: str, markdown_text: str) -> None:
+    def _write_bytes(output_path: Path, data: bytes) -> None:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_bytes(data)
+
+    @staticmethod
+    def write_many(
+        outputs: Iterable[Tuple[str, str]],
+        max_workers: int = WRITE_WORKERS,
+    ) -> List[WriteResult]:
+        """Write (output_file, text) pairs on a thread pool, in input order.
+
+        outputs may be a generator: each digest is queued as soon as it is rendered.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(Organiser._write, path, text) for path, text in outputs]
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def render_parallel(
+        jobs: Iterable[Tuple[str, User]],
+        context: RenderContext,
+        workers: int,
+        chunk_size: int = RENDER_CHUNK,
+    ) -> Tuple[List[WriteResult], List[WorkerReport]]:
+        """Render and write (output_file, user) jobs across a process pool.
+
+        The context is sent to each worker once. Users travel as compact tuples
+        holding only what the page shows, never their feeds. jobs may be a
+        generator: chunks are submitted as soon as they fill.
+        """
+        reports: Dict[int, WorkerReport] = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker, initargs=(context,)) as executor:
+            futures = [executor.submit(_render_chunk, chunk) for chunk in Organiser._chunks(jobs, chunk_size)]
+            results: List[WriteResult] = []
+            for future in futures:
+                chunk_results, report = future.result()
+                results.extend(chunk_results)
+                total = reports.setdefault(report.pid, WorkerReport(report.pid))
+                total.digests += report.digests
+                total.bytes_written += report.bytes_written
+                total.render_time += report.render_time
+                total.write_time += report.write_time
+        return results, sorted(reports.values(), key=lambda report: report.pid)
+
+    @staticmethod
+    def _chunks(jobs: Iterable[Tuple[str, User]], chunk_size: int) -> Iterator[RenderChunk]:
+        headlines: Dict[Tuple[str, str], int] = {}
+        rows = []
+        for output_file, user in jobs:
+            ids = tuple(
+                headlines.setdefault((article.title, article.url), len(headlines))
+                for article in user.top_articles or []
+            )
+            rows.append((output_file, user.name, user.summary or "", ids))
+            if len(rows) == chunk_size:
+                yield list(headlines), rows
+                headlines, rows = {}, []
+        if rows:
+            yield list(headlines), rows
+
+    @staticmethod
+    def _write(output_file: str, markdown_text: str) -> WriteResult:
+        """Atomically replace output_file, leaving it untouched if its content is unchanged."""
+        start = time.perf_counter()
         output_path = Path(output_file)
+        data = markdown_text.encode("utf-8")
+        if Organiser._same_content(output_path, data):
+            return WriteResult(output_file, 0, time.perf_counter() - start, unchanged=True)
+
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        if output_path.exists():
-            output_path.unlink()
-        output_path.write_text(markdown_text, encoding="utf-8")
+        # Write beside the target so the rename stays on one filesystem; a crash
+        # leaves at most a stray temp file, never a truncated digest.
+        fd, temp_name = tempfile.mkstemp(dir=output_path.parent, prefix=f".{output_path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.chmod(temp_name, 0o644) # mkstemp creates 0600; digests are served publicly
+            os.replace(temp_name, output_path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+        return WriteResult(output_file, len(data), time.perf_counter() - start)
+
+    @staticmethod
+    def _same_content(output_path: Path, data: bytes) -> bool:
+        try:
+            if output_path.stat().st_size != len(data):
+                return False
+            existing = output_path.read_bytes()
+        except OSError:
+            return False
+        return existing == data
+
+
+_worker_context: Optional[RenderContext] = None
+
+
+def _init_render_worker(context: RenderContext) -> None:
+    global _worker_context
+    _worker_context = context
+
+
+def _render_chunk(chunk: RenderChunk) -> Tuple[List[WriteResult], WorkerReport]:
+    headlines, rows = chunk
+    articles = [Article(title=title, url=url) for title, url in headlines]
+    report = WorkerReport(os.getpid())
+    results = []
+    for output_file, name, summary, ids in rows:
+        start = time.perf_counter()
+        user = User(username="", name=name, selected_feeds=[], summary=summary, top_articles=[articles[i] for i in ids])
+        text = Organiser.render(user, _worker_context)
+        report.render_time += time.perf_counter() - start
+        result = Organiser._write(output_file, text)
+        report.write_time += result.elapsed
+        report.bytes_written += result.bytes_written
+        report.digests += 1
+        results.append(result)
+    return results, report
 
 
 def build(
     user: User,
     output_file: str = "output/morning_digest.md",
+    context: Optional[RenderContext] = None,
 ) -> str:
-    return Organiser.build(user=user, output_file=output_file)
\ No newline at end of file
+    return Organiser.build(user=user, output_file=output_file, context=context)
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""profiles.py
+
+Group readers who follow exactly the same feeds into profiles, so ranking and
+summarising run once per distinct profile instead of once per reader.
+"""
+
+from dataclasses import dataclass, field
+import hashlib
+import json
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from commons import User
+
+
+@dataclass
+class Profile:
+    key: Tuple[str, ...] # Sorted feed names
+    reader: User # Stands in for every member while ranking and summarising
+    members: List[User] = field(default_factory=list)
+
+    def fan_out(self) -> List[User]:
+        """Copy the reader's ranked articles and summary to every member."""
+        for user in self.members:
+            user.top_articles = self.reader.top_articles
+            user.summary = self.reader.summary
+            user.prompt_tokens = self.reader.prompt_tokens
+        return self.members
+
+    def fingerprint(self) -> str:
+        """Hash of the reader's top headlines, in order."""
+        text = "\n".join(f"{article.title}\t{article.url}" for article in self.reader.top_articles or [])
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class Profiles:
+
+    @staticmethod
+    def profile_key(user: User) -> Tuple[str, ...]:
+        return tuple(sorted({feed.name for feed in user.selected_feeds}))
+
+    @staticmethod
+    def state_key(key: Tuple[str, ...]) -> str:
+        """A profile key as stored by ClusterCache and DigestState."""
+        return json.dumps(list(key), ensure_ascii=False)
+
+    @staticmethod
+    def group(users: Iterable[User]) -> List[Profile]:
+        """One Profile per distinct feed set, in order of first appearance.
+
+        The reader takes the first member's feed order, so a profile with a
+        single member ranks and summarises exactly as that member would.
+        """
+        profiles: Dict[Tuple[str, ...], Profile] = {}
+        for user in users:
+            key = Profiles.profile_key(user)
+            profile = profiles.get(key)
+            if profile is None:
+                reader = User(
+                    username=f"profile-{len(profiles)}",
+                    name=user.name or user.username,
+                    selected_feeds=user.selected_feeds,
+                )
+                profile = profiles[key] = Profile(key=key, reader=reader)
+            profile.members.append(user)
+        for profile in profiles.values():
+            if len(profile.members) > 1:
+                profile.reader.name += f" +{len(profile.members) - 1}"
+        return list(profiles.values())
+
+    @staticmethod
+    def readers(profiles: Sequence[Profile]) -> List[User]:
+        return [profile.reader for profile in profiles]
+
+    @staticmethod
+    def fan_out(profiles: Sequence[Profile], ready: Iterable[User]) -> Iterator[User]:
+        """Yield the members of each profile as its reader comes out of ready."""
+        by_reader = {id(profile.reader): profile for profile in profiles}
+        for reader in ready:
+            yield from by_reader[id(reader)].fan_out()
@@ -1,23 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import math
 import os
-from openai import OpenAI
-from typing import List, Sequence
+import queue
+import random
+import threading
+import time
+import numpy as np
+from openai import APIConnectionError, OpenAI
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from commons import User, Feed
+from cache import ResponseCache
+from commons import Article, User, Feed
+from http_client import HttpClient
+
+
+SUMMARY_MODES = ("direct", "map-reduce")
+
+
+@dataclass(frozen=True)
+class Prompt:
+    text: str
+    tokens: int # Estimated tokens in text
+    articles: int # Items included: articles, or feed sections in a reduce prompt
+    dropped: int # Items left out: near-duplicate or over-budget articles, or feeds without notes
+    unit: str = "article" # What articles and dropped count, for logging
 
 
 class Summariser:
     """Create concise newsletter summaries using GPT-5-Nano."""
 
-    CLIENT = OpenAI()
+    CLIENT: Optional[OpenAI] = None # Overrides the client built on HttpClient.shared() when set
+    INSTRUCTIONS: str = (
+        "You are a friendly and personal morning newsletter writer for a Singapore audience. "
+        f"Write 3 short, engaging paragraphs summarising the following news items. "
+        f"Be concise, human, and lightly opinionated. Use simple language and a warm tone!' "
+    )
+    FEED_INSTRUCTIONS: str = (
+        "You are a news editor preparing notes for a newsletter writer. "
+        "Condense the following items from one news feed into at most 6 factual bullet points, "
+        "most important first. Keep names, numbers and places; no commentary."
+    )
+    MAX_WORKERS: int = 4 # Concurrent model requests
+    TIMEOUT: float = 120.0 # Per-request timeout in seconds
+    MAX_RETRIES: int = 5 # Retries after a rate limit, server error or dropped connection
+    BACKOFF: float = 1.0 # First retry delay in seconds, doubled each attempt
+    TOKEN_BUDGET: int = 6000 # Estimated prompt tokens per request
+    SUMMARY_CHARS: int = 280 # Article summaries are cut to this length
+    DUPLICATE_SIMILARITY: float = 0.9 # Headlines this similar count as one story
+
+    _client: Optional[OpenAI] = None
+    _client_http = None # The shared httpx client _client was built on
+    _client_lock = threading.Lock()
 
     def __init__(
         self,
         model: str = "gpt-5-nano",
+        max_workers: int = MAX_WORKERS,
+        timeout: float = TIMEOUT,
+        cache: Optional[ResponseCache] = None,
+        embedder: Optional[Callable[[Sequence[str]], np.ndarray]] = None,
+        token_budget: int = TOKEN_BUDGET,
+        mode: str = "direct",
+        stream: bool = False,
     ) -> None:
         self.check_api_key()
 
-        self.client = self.CLIENT
         self.model = model
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache = cache
+        self.embedder = embedder
+        self.token_budget = token_budget
+        self.mode = mode
+        self.stream = stream
+
+    @staticmethod
+    def openai_client() -> OpenAI:
+        """Return the OpenAI client on the current shared HttpClient.
+
+        Built on first use and rebuilt after HttpClient.close() replaces the
+        shared client, so model calls never go through a closed pool.
+        """
+        if Summariser.CLIENT is not None:
+            return Summariser.CLIENT
+        http = HttpClient.shared()
+        with Summariser._client_lock:
+            if Summariser._client is None or Summariser._client_http is not http:
+                # MAX_RETRIES and BACKOFF in invoke_with_retry are the only retry policy.
+                Summariser._client = OpenAI(http_client=http, max_retries=0)
+                Summariser._client_http = http
+            return Summariser._client
+
+    @property
+    def client(self) -> OpenAI:
+        return self.openai_client()
 
     @staticmethod
     def check_api_key():
@@ -33,25 +111,260 @@ class Summariser:
         ]
         return "\n\n".join(articles)
 
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # ~4 characters per token for English text with GPT tokenisers.
+        return math.ceil(len(text) / 4)
+
+    @staticmethod
+    def truncate(text: str, limit: int) -> str:
+        text = " ".join(text.split())
+        if len(text) <= limit:
+            return text
+        return text[:limit].rsplit(" ", 1)[0] + "…"
+
+    @staticmethod
+    def ranked_items(feeds: Sequence[Feed], top_articles: Optional[Sequence[Article]] = None) -> List[Tuple[str, Article]]:
+        """(feed name, article) pairs: TopExtractor's picks first, then feed order."""
+        items = [(feed.name, article) for feed in feeds for article in feed.article]
+        top = {id(article): rank for rank, article in enumerate(top_articles or [])}
+        return sorted(items, key=lambda item: top.get(id(item[1]), len(top)))
+
+    def near_duplicates(self, titles: Sequence[str]) -> List[bool]:
+        """Flag each title that is too similar to an earlier title that was kept."""
+        if self.embedder is None or len(titles) < 2:
+            return [False] * len(titles)
+        embeddings = np.asarray(self.embedder(titles), dtype=float)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        unit = embeddings / np.clip(norms, 1e-12, None)
+        kept: List[int] = []
+        flags: List[bool] = []
+        for i, vector in enumerate(unit):
+            duplicate = bool(kept) and float((unit[kept] @ vector).max()) >= self.DUPLICATE_SIMILARITY
+            flags.append(duplicate)
+            if not duplicate:
+                kept.append(i)
+        return flags
+
+    def build_prompt(self, user: User) -> Prompt:
+        return self.prompt_for(user.selected_feeds, user.top_articles)
+
+    def prompt_for(self, feeds: Sequence[Feed], top_articles: Optional[Sequence[Article]] = None) -> Prompt:
+        """Assemble the feeds' news items within the token budget.
+
+        Ranked articles go first, exact and near-duplicate headlines are
+        dropped, and long summaries are cut to SUMMARY_CHARS.
+        """
+        seen = set()
+        items = []
+        for feed_name, article in self.ranked_items(feeds, top_articles):
+            if article.title not in seen:
+                seen.add(article.title)
+                items.append((feed_name, article))
+        duplicates = self.near_duplicates([article.title for _, article in items])
+
+        lines: List[str] = []
+        tokens = 0
+        for (feed_name, article), duplicate in zip(items, duplicates):
+            if duplicate:
+                continue
+            line = f"{feed_name}: {article.title}: {self.truncate(article.summary or '', self.SUMMARY_CHARS)}"
+            line_tokens = self.estimate_tokens(line + "\n\n")
+            if tokens + line_tokens > self.token_budget:
+                continue
+            lines.append(line)
+            tokens += line_tokens
+
+        total = sum(len(feed.article) for feed in feeds)
+        return Prompt(text="\n\n".join(lines), tokens=tokens, articles=len(lines), dropped=total - len(lines))
+
+    @staticmethod
+    def is_retryable(exc: Exception) -> bool:
+        """The errors the OpenAI SDK retries itself: connection failures and timeouts, 408, 409, 429 and 5xx."""
+        if isinstance(exc, APIConnectionError): # APITimeoutError included
+            return True
+        status = getattr(exc, "status_code", None)
+        return status in (408, 409, 429) or (isinstance(status, int) and status >= 500)
+
     def invoke_model(self, instructions: str, prompt: str) -> str:
+        if self.stream:
+            return self.invoke_model_stream(instructions, prompt)
         response = self.client.responses.create(
             model=self.model,
             instructions=instructions,
             input=prompt,
+            timeout=self.timeout,
         )
         return response.output_text or ""
-        
-    def summarise(self, users: List[User]) -> None:
+
+    def invoke_model_stream(self, instructions: str, prompt: str) -> str:
+        # Streamed responses apply the timeout between events, not to the whole generation.
+        events = self.client.responses.create(
+            model=self.model,
+            instructions=instructions,
+            input=prompt,
+            timeout=self.timeout,
+            stream=True,
+        )
+        parts: List[str] = []
+        for event in events:
+            if event.type == "response.output_text.delta":
+                parts.append(event.delta)
+            elif event.type in ("error", "response.failed"):
+                raise RuntimeError(f"Streamed response failed: {event}")
+        return "".join(parts)
+
+    def invoke_with_retry(self, instructions: str, prompt: str) -> str:
+        attempt = 0
+        while True:
+            try:
+                return self.invoke_model(instructions, prompt)
+            except Exception as exc:
+                if not self.is_retryable(exc) or attempt >= self.MAX_RETRIES:
+                    raise
+            # Exponential backoff with jitter so workers don't retry in lockstep.
+            time.sleep(self.BACKOFF * 2 ** attempt * random.uniform(0.5, 1.0))
+            attempt += 1
+
+    def prompt_key(self, instructions: str, prompt: str) -> str:
+        digest = hashlib.sha256()
+        for part in (self.model, instructions, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def complete(self, instructions: str, prompt: str) -> str:
+        """Invoke the model, answering from the response cache when possible."""
+        if self.cache is None:
+            return self.invoke_with_retry(instructions, prompt)
+        key = self.prompt_key(instructions, prompt)
+        response = self.cache.get(key)
+        if response is None:
+            response = self.invoke_with_retry(instructions, prompt)
+            if response.strip():
+                self.cache.put(key, response)
+        return response
+
+    def summarise_prompt(self, prompt: str, readers: Sequence[User]) -> Optional[str]:
+        try:
+            return self.complete(self.INSTRUCTIONS, prompt).strip()
+        except Exception as exc:
+            names = ", ".join(user.name or user.username for user in readers)
+            print(f"⚠️  Summary failed for {names}: {type(exc).__name__}: {exc}")
+            return None
+
+    def run_bounded(self, fn: Callable, items: Sequence) -> List:
+        workers = max(1, min(self.max_workers, len(items) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(fn, items))
+
+    # ------------------------------------------------------------------
+    # Map-reduce mode
+    # ------------------------------------------------------------------
+    def summarise_feed(self, feed: Feed) -> Optional[str]:
+        prompt = self.prompt_for([feed])
+        if not prompt.text:
+            return None
+        try:
+            return self.complete(self.FEED_INSTRUCTIONS, prompt.text).strip() or None
+        except Exception as exc:
+            print(f"⚠️  Feed summary failed for {feed.name}: {type(exc).__name__}: {exc}")
+            return None
+
+    def summarise_feeds(self, users: Sequence[User]) -> Dict[str, str]:
+        """Map stage: one mini-summary per feed selected by anyone, shared by all readers."""
+        feeds = list({feed.name: feed for user in users for feed in user.selected_feeds}.values())
+        digests = self.run_bounded(self.summarise_feed, feeds)
+        return {feed.name: digest for feed, digest in zip(feeds, digests) if digest}
+
+    def reduce_prompt(self, user: User, feed_summaries: Dict[str, str]) -> Prompt:
+        sections = [
+            f"{feed.name}:\n{feed_summaries[feed.name]}"
+            for feed in user.selected_feeds
+            if feed.name in feed_summaries
+        ]
+        text = "\n\n".join(sections)
+        return Prompt(
+            text=text,
+            tokens=self.estimate_tokens(text),
+            articles=len(sections),
+            dropped=len(user.selected_feeds) - len(sections),
+            unit="feed section",
+        )
+
+    # ------------------------------------------------------------------
+    # Grouping and fan-out
+    # ------------------------------------------------------------------
+    def group_prompts(
+        self,
+        users: Sequence[User],
+        build: Optional[Callable[[User], Prompt]] = None,
+    ) -> Dict[str, Tuple[str, List[User]]]:
+        """Group users whose (model, instructions, prompt) are byte-identical."""
+        build = build or self.build_prompt
+        groups: Dict[str, Tuple[str, List[User]]] = {}
         for user in users:
-            selected_feeds = user.selected_feeds
-            if not selected_feeds:
+            if not user.selected_feeds:
+                continue
+            prompt = build(user)
+            user.prompt_tokens = prompt.tokens
+            if not prompt.text:
                 continue
-            prompt: str = self.feed_to_str(selected_feeds)
-            instructions = (
-                "You are a friendly and personal morning newsletter writer for a Singapore audience. "
-                f"Write 3 short, engaging paragraphs summarising the following news items. "
-                f"Be concise, human, and lightly opinionated. Use simple language and a warm tone!' "
-            )
-            summary = self.invoke_model(instructions, prompt)
-            user.summary = summary.strip()
-            
+            key = self.prompt_key(self.INSTRUCTIONS, prompt.text)
+            if key not in groups:
+                print(f"📝 Prompt for {user.name or user.username}: ~{prompt.tokens} tokens, "
+                      f"{prompt.articles} {prompt.unit}(s), {prompt.dropped} dropped")
+            groups.setdefault(key, (prompt.text, []))[1].append(user)
+        return groups
+
+    def summarise_iter(self, users: List[User]) -> Iterator[User]:
+        """Yield users as soon as their summary is ready.
+
+        Worker threads put each finished prompt group on a queue, which this
+        generator drains, so callers can render and write early digests while
+        later ones are still being generated. Every user is yielded exactly
+        once; users without a prompt are yielded first.
+        """
+        if self.mode not in SUMMARY_MODES:
+            raise ValueError(f"Unknown summary mode '{self.mode}'. Choose one of: {', '.join(SUMMARY_MODES)}.")
+        build = None
+        if self.mode == "map-reduce":
+            feed_summaries = self.summarise_feeds(users)
+            build = lambda user: self.reduce_prompt(user, feed_summaries)  # noqa: E731
+
+        groups = list(self.group_prompts(users, build).values())
+        grouped = {id(user) for _prompt, readers in groups for user in readers}
+        yield from (user for user in users if id(user) not in grouped)
+
+        ready: "queue.Queue[Tuple[List[User], Optional[str]]]" = queue.Queue()
+
+        def produce(prompt: str, readers: List[User]) -> None:
+            summary = None
+            try:
+                summary = self.summarise_prompt(prompt, readers)
+            finally:
+                ready.put((readers, summary))
+
+        pool = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(groups) or 1)))
+        try:
+            for prompt, readers in groups:
+                pool.submit(produce, prompt, readers)
+            for _ in groups:
+                readers, summary = ready.get()
+                for user in readers:
+                    if summary is not None:
+                        user.summary = summary
+                    yield user
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def summarise(self, users: List[User]) -> None:
+        """Call the model once per distinct prompt on a bounded thread pool.
+
+        Every user sharing a prompt receives the same summary, matching what the
+        sequential path would produce for each of them. In map-reduce mode each
+        user's prompt is built from shared per-feed mini-summaries instead of
+        raw articles, so its size no longer grows with the number of articles.
+        """
+        for _user in self.summarise_iter(users):
+            pass
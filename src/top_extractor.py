@@ -1,30 +1,162 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import Sequence
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+import threading
 import numpy as np
-import hdbscan
 
-from commons import User
+from cache import ClusterCache, ClusterState, EmbeddingCache
+from commons import Feed, User
+from embedder import EmbeddingBackend, backend_name, make_backend
+from profiles import Profiles
+
+
+@dataclass
+class HeadlinePool:
+    """Deduplicated headlines of every feed in the run, embedded once."""
+
+    headlines: List[str] # One entry per unique headline
+    embeddings: np.ndarray # Row i embeds headlines[i]
+    rows: Dict[str, int] # Headline -> row index
+
+    def select(self, feeds: Sequence[Feed]) -> Tuple[List[str], np.ndarray]:
+        """Return the headlines of feeds and their embedding rows, in pool order."""
+        rows = sorted({self.rows[article.title] for feed in feeds for article in feed.article})
+        if rows and rows[-1] - rows[0] + 1 == len(rows):
+            # Contiguous rows (e.g. a user with every feed): slice a view, no copy.
+            index = slice(rows[0], rows[-1] + 1)
+            return self.headlines[index], self.embeddings[index]
+        return [self.headlines[i] for i in rows], self.embeddings[rows]
+
 
 class TopExtractor:
 
-    EMBEDDING_MODEL: SentenceTransformer = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    MODEL_NAME: str = "sentence-transformers/all-MiniLM-L6-v2"
+    BACKEND: str = os.environ.get("EMBEDDING_BACKEND", "sentence-transformers") # See embedder.BACKENDS
     TOP_N: int = 15
+    EXACT_MEDOIDS: bool = False # Use full per-cluster similarity matrices
+    DRIFT_THRESHOLD: float = 0.25 # Refit a profile once this share of its headlines changed since the last fit
+    NOISE_THRESHOLD: float = 0.5 # ... or once this share of its new headlines fits no existing cluster
+
+    # torch, sklearn and hdbscan are imported on first use, not at import time.
+    _backend: Optional[EmbeddingBackend] = None
+    _backend_lock = threading.Lock()
+
+    @staticmethod
+    def embedding_backend() -> EmbeddingBackend:
+        """Return the configured embedding backend, loading its model once on first call."""
+        if TopExtractor._backend is None:
+            with TopExtractor._backend_lock:
+                if TopExtractor._backend is None:
+                    TopExtractor._backend = make_backend(TopExtractor.BACKEND, TopExtractor.MODEL_NAME)
+        return TopExtractor._backend
+
+    @staticmethod
+    def backend_name() -> str:
+        """Name of the configured backend, known without loading its model."""
+        return backend_name(TopExtractor.BACKEND, TopExtractor.MODEL_NAME)
+
+    @staticmethod
+    def warm_up() -> None:
+        TopExtractor.embedding_backend()
 
     @staticmethod
-    def embed(texts):
-        return TopExtractor.EMBEDDING_MODEL.encode(texts, show_progress_bar=False)
+    def encode(texts):
+        return TopExtractor.embedding_backend().encode(texts)
+
+    @staticmethod
+    def embed(texts, cache: Optional[EmbeddingCache] = None):
+        if cache is None:
+            return TopExtractor.encode(texts)
+        # Keyed by backend name, so quantised vectors never mix with full-precision ones.
+        # The model itself is only loaded by TopExtractor.encode, on a cache miss.
+        return cache.encode(TopExtractor.backend_name(), texts, TopExtractor.encode)
 
     @staticmethod
     def cluster_headlines(embeddings, min_cluster_size=4):
+        import hdbscan
+
         clusterer = hdbscan.HDBSCAN(min_cluster_size=min_cluster_size)
         labels = clusterer.fit_predict(embeddings)
         return labels
 
     @staticmethod
-    def cluster_medoids(headlines, embeddings, labels):
-        medoids = []
+    def fit_clusterer(embeddings, min_cluster_size=4):
+        """Fit HDBSCAN with the prediction data approximate_predict needs later."""
+        import hdbscan
+
+        clusterer = hdbscan.HDBSCAN(min_cluster_size=min_cluster_size, prediction_data=True)
+        labels = clusterer.fit_predict(embeddings)
+        return clusterer, np.asarray(labels, dtype=np.int64)
+
+    @staticmethod
+    def cluster_incremental(key: str, model: str, headlines, embeddings, clusters: ClusterCache, min_cluster_size=4):
+        """Label headlines, reusing the profile's clusters from the last run.
+
+        Headlines already labelled keep their labels and new ones are assigned
+        to existing clusters with hdbscan.approximate_predict. The profile is
+        refitted from scratch when there is no usable state, when more than
+        DRIFT_THRESHOLD of its headlines were added or dropped since the last
+        fit, or when most new headlines are noise (a story the old clusters
+        cannot represent).
+        """
+        state = clusters.get(key, model)
+        if state is not None:
+            previous = dict(zip(state.headlines, state.labels.tolist()))
+            new_rows = [i for i, headline in enumerate(headlines) if headline not in previous]
+            dropped = len(previous) - (len(headlines) - len(new_rows))
+            if not new_rows and not dropped:
+                return np.array([previous[headline] for headline in headlines], dtype=np.int64)
+
+            drift = state.drift + len(new_rows) + dropped
+            if drift <= TopExtractor.DRIFT_THRESHOLD * state.fitted:
+                labels = np.array([previous.get(headline, -1) for headline in headlines], dtype=np.int64)
+                if new_rows:
+                    import hdbscan
+
+                    predicted, _strengths = hdbscan.approximate_predict(state.clusterer, embeddings[new_rows])
+                    labels[new_rows] = predicted
+                    noise = np.count_nonzero(labels[new_rows] == -1)
+                    if len(new_rows) >= min_cluster_size and noise > TopExtractor.NOISE_THRESHOLD * len(new_rows):
+                        labels = None
+                if labels is not None:
+                    clusters.put(key, model, ClusterState(list(headlines), labels, state.clusterer, state.fitted, drift))
+                    return labels
+
+        clusterer, labels = TopExtractor.fit_clusterer(embeddings, min_cluster_size=min_cluster_size)
+        clusters.put(key, model, ClusterState(list(headlines), labels, clusterer, len(headlines), 0))
+        return labels
+
+    @staticmethod
+    def cluster_medoid_indices(embeddings, labels, exact: Optional[bool] = None) -> List[int]:
+        exact = TopExtractor.EXACT_MEDOIDS if exact is None else exact
+        labels = np.asarray(labels)
         unique_labels = [label for label in set(labels) if label != -1] # Ignore noise (-1)
+        if exact:
+            return TopExtractor._exact_medoid_indices(embeddings, labels, unique_labels)
+
+        # Row sums of a cosine matrix equal each unit vector dotted with the sum of
+        # the cluster's unit vectors, so every cluster is scored in one O(n) pass.
+        embeddings = np.asarray(embeddings, dtype=float)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        members = np.flatnonzero(labels != -1)
+        unit = embeddings[members] / norms[members]
+        cluster_ids, group = np.unique(labels[members], return_inverse=True)
+        sums = np.zeros((len(cluster_ids), unit.shape[1]))
+        np.add.at(sums, group, unit)
+        total_sim = np.einsum("ij,ij->i", unit, sums[group])
+
+        # Best score per cluster, lowest index on ties (as np.argmax)
+        order = np.lexsort((members, -total_sim, group))
+        firsts = order[np.r_[0, np.flatnonzero(np.diff(group[order])) + 1]] if len(order) else order
+        medoid_of = dict(zip(cluster_ids.tolist(), members[firsts].tolist()))
+        return [medoid_of[label] for label in unique_labels]
+
+    @staticmethod
+    def _exact_medoid_indices(embeddings, labels, unique_labels) -> List[int]:
+        from sklearn.metrics.pairwise import cosine_similarity
+
+        medoids = []
         for label in unique_labels:
             idx = np.where(labels == label)[0]
             cluster_emb = embeddings[idx]
@@ -32,51 +164,85 @@ class TopExtractor:
             sim_matrix = cosine_similarity(cluster_emb)
             # Medoid = headline with highest total similarity
             total_sim = sim_matrix.sum(axis=1)
-            medoid_idx = idx[np.argmax(total_sim)]
-
-            medoids.append(headlines[medoid_idx])
+            medoids.append(int(idx[np.argmax(total_sim)]))
         return medoids
 
+    @staticmethod
+    def cluster_medoids(headlines, embeddings, labels):
+        return [headlines[i] for i in TopExtractor.cluster_medoid_indices(embeddings, labels)]
+
     @staticmethod
     def mmr_select(candidates, embeddings, top_n=TOP_N, lambda_param=0.6):
         if len(candidates) <= top_n:
             return candidates
-        
+        from sklearn.metrics.pairwise import cosine_similarity
+
         sim_matrix = cosine_similarity(embeddings)
-        selected = []
 
         # Relevance vector = similarity to average embedding
         centroid = embeddings.mean(axis=0)
         relevance = cosine_similarity(embeddings, centroid.reshape(1,-1)).flatten()
 
         # 1st selected is most relevant
-        selected_idx = [np.argmax(relevance)]
+        selected_idx = [int(np.argmax(relevance))]
+        available = np.ones(len(candidates), dtype=bool)
+        available[selected_idx[0]] = False
+        # Running max similarity of every candidate to the selected set
+        redundancy = sim_matrix[:, selected_idx[0]].copy()
 
         while len(selected_idx) < top_n:
-            remaining = [i for i in range(len(candidates)) if i not in selected_idx]
+            scores = lambda_param * relevance - (1 - lambda_param) * redundancy
+            scores[~available] = -np.inf
 
-            scores = []
-            for i in remaining:
-                redundancy = max(sim_matrix[i][selected_idx])
-                score = lambda_param * relevance[i] - (1 - lambda_param) * redundancy
-                scores.append((score, i))
-            
-            # Pick Best
-            best_idx = max(scores)[1]
+            # Pick Best; ties go to the highest index, as max() over (score, i) did
+            best_idx = len(scores) - 1 - int(np.argmax(scores[::-1]))
             selected_idx.append(best_idx)
+            available[best_idx] = False
+            np.maximum(redundancy, sim_matrix[:, best_idx], out=redundancy)
 
         return [candidates[i] for i in selected_idx]
     
     @staticmethod
-    def pick_top_articles(users: Sequence[User]):
+    def build_pool(feeds: Sequence[Feed], cache: Optional[EmbeddingCache] = None) -> HeadlinePool:
+        rows: Dict[str, int] = {}
+        for feed in feeds:
+            for article in feed.article:
+                rows.setdefault(article.title, len(rows))
+        headlines = list(rows)
+        embeddings = TopExtractor.embed(headlines, cache=cache)
+        return HeadlinePool(headlines=headlines, embeddings=embeddings, rows=rows)
+
+    @staticmethod
+    def pick_top_articles(
+        users: Sequence[User],
+        cache: Optional[EmbeddingCache] = None,
+        clusters: Optional[ClusterCache] = None,
+    ):
+        """Rank each user's top articles.
+
+        With clusters, each feed profile's clusters carry over between runs
+        (see cluster_incremental) instead of being refitted every time.
+        """
+        # Users share Feed objects, so embed the union of their feeds once per run.
+        feeds = list({id(feed): feed for user in users for feed in user.selected_feeds}.values())
+        pool = TopExtractor.build_pool(feeds, cache=cache)
+        model = TopExtractor.backend_name()
+
         for user in users:
-            headlines = [article.title for feed in user.selected_feeds for article in feed.article]
+            headlines, embeddings = pool.select(user.selected_feeds)
+            if not headlines:
+                user.top_articles = []
+                continue
 
-            embeddings = TopExtractor.embed(headlines)
-            labels = TopExtractor.cluster_headlines(embeddings)
-            # Extract Medoids
-            medoid_headlines = TopExtractor.cluster_medoids(headlines, embeddings, labels)
-            medoid_embeddings = TopExtractor.embed(medoid_headlines)
+            if clusters is None:
+                labels = TopExtractor.cluster_headlines(embeddings)
+            else:
+                key = Profiles.state_key(Profiles.profile_key(user))
+                labels = TopExtractor.cluster_incremental(key, model, headlines, embeddings, clusters)
+            # Extract Medoids, reusing their rows instead of re-encoding them
+            medoid_idx = TopExtractor.cluster_medoid_indices(embeddings, labels)
+            medoid_headlines = [headlines[i] for i in medoid_idx]
+            medoid_embeddings = embeddings[medoid_idx]
         
             selected_headlines = TopExtractor.mmr_select(medoid_headlines, medoid_embeddings, top_n=TopExtractor.TOP_N)
             
@@ -14,12 +14,13 @@ if "openai" not in sys.modules:
         return SimpleNamespace(output_text="")
 
     class _DummyClient:
-        def __init__(self):
+        def __init__(self, **_kwargs):
             self.responses = SimpleNamespace(create=_dummy_create)
 
     dummy_module = types.ModuleType("openai")
     dummy_module.__spec__ = ModuleSpec(name="openai", loader=None)
     dummy_module.OpenAI = _DummyClient
+    dummy_module.APIConnectionError = type("APIConnectionError", (Exception,), {})
     sys.modules["openai"] = dummy_module
 
 from commons import Article, Feed, User  # noqa: E402
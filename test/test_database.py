@@ -1,8 +1,10 @@
 """Tests for the SQLite-backed Database helper."""
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Sequence
+import sqlite3
 import sys
 
 import pytest
@@ -13,6 +15,7 @@ if str(SRC_PATH) not in sys.path:
     sys.path.append(str(SRC_PATH))
 
 import database as database_module  # noqa: E402
+from ingester import Ingester  # noqa: E402
 from commons import Feed  # noqa: E402
 
 
@@ -92,3 +95,121 @@ def test_serialisation_round_trip():
     restored = database_module.Database.deserialise_feeds(payload)
 
     assert restored == feeds
+
+
+def test_iter_users_streams_in_insertion_order(database):
+    for i in range(5):
+        database.add(f"user{i}", f"User {i}", ["StraitsTimes World", "business"][: i % 3])
+
+    users = list(database.iter_users(batch_size=2))
+
+    assert [user.username for user in users] == [f"user{i}" for i in range(5)]
+    assert [len(user.selected_feeds) for user in users] == [0, 1, 3, 0, 1]
+
+
+def test_same_selection_is_resolved_once(database):
+    database_module.Database.resolve_feeds.cache_clear()
+    for i in range(4):
+        database.add(f"user{i}", f"User {i}", ["sport", "StraitsTimes Tech"])
+
+    users = database.get_all()
+    misses = database_module.Database.resolve_feeds.cache_info().misses
+
+    assert misses == 1
+    assert all(user.selected_feeds is users[0].selected_feeds for user in users)
+
+
+@pytest.mark.parametrize(
+    "keywords",
+    [(), ("StraitsTimes Tech", "business"), ("sport", "StraitsTimes Sport", "asia"), ("unknown", "world")],
+)
+def test_resolve_feeds_matches_ingester(keywords):
+    resolved = database_module.Database.resolve_feeds(keywords)
+
+    assert list(resolved) == list(Ingester.match_feeds(keywords))
+
+
+def test_json_feeds_column_is_migrated(tmp_path, monkeypatch):
+    monkeypatch.setattr(database_module, "User", _TestUser)
+    db_path = tmp_path / "users.db"
+    legacy = sqlite3.connect(db_path)
+    legacy.execute("CREATE TABLE users (username TEXT PRIMARY KEY, name TEXT NOT NULL, selected_feeds TEXT NOT NULL)")
+    legacy.executemany(
+        "INSERT INTO users VALUES (?, ?, ?)",
+        [("zoe", "Zoe", '["StraitsTimes Tech"]'), ("adam", "Adam", '["ChannelNewsAsia Sport", "StraitsTimes Life"]')],
+    )
+    legacy.commit()
+    legacy.close()
+
+    db = database_module.Database(path=str(db_path))
+    users = db.get_all()
+    columns = {row[1] for row in db.conn.execute("PRAGMA table_info(users)")}
+    db.conn.close()
+
+    assert columns == {"username", "name"}
+    assert [user.username for user in users] == ["zoe", "adam"]
+    assert [feed.name for feed in users[1].selected_feeds] == ["ChannelNewsAsia Sport", "StraitsTimes Life"]
+
+
+def test_add_many_upserts_in_one_transaction(database):
+    database.add("alice", "Alice", ["StraitsTimes World"])
+
+    written = database.add_many([
+        ("bob", "Bob", ["sport"]),
+        ("alice", "Alicia", ["StraitsTimes Tech", "ChannelNewsAsia World"]),
+    ])
+    users = database.get_all()
+
+    assert written == 2
+    assert [(user.username, user.name) for user in users] == [("alice", "Alicia"), ("bob", "Bob")]
+    assert [feed.name for feed in users[0].selected_feeds] == ["StraitsTimes Tech", "ChannelNewsAsia World"]
+
+
+def test_update_many_skips_unknown_users_and_keeps_unset_fields(database):
+    database.add_many([("carol", "Carol", ["StraitsTimes Life"]), ("dave", "Dave", ["StraitsTimes Asia"])])
+
+    found = database.update_many([
+        ("carol", None, ["ChannelNewsAsia Sport"]),
+        ("dave", "David", None),
+        ("ghost", "Ghost", ["StraitsTimes Tech"]),
+    ])
+    users = {user.username: user for user in database.get_all()}
+
+    assert found == 2
+    assert set(users) == {"carol", "dave"}
+    assert (users["carol"].name, [feed.name for feed in users["carol"].selected_feeds]) == ("Carol", ["ChannelNewsAsia Sport"])
+    assert (users["dave"].name, [feed.name for feed in users["dave"].selected_feeds]) == ("David", ["StraitsTimes Asia"])
+
+
+def test_repeated_usernames_in_a_batch_apply_in_order(database):
+    written = database.add_many([
+        ("erin", "Erin", ["sport"]),
+        ("frank", "Frank", ["StraitsTimes Tech"]),
+        ("erin", "Erin B", ["StraitsTimes Tech"]),
+    ])
+    found = database.update_many([
+        ("frank", "Franklin", ["StraitsTimes World"]),
+        ("frank", None, ["ChannelNewsAsia World", "StraitsTimes Tech"]),
+    ])
+    users = database.get_all()
+
+    assert (written, found) == (2, 1)
+    assert [(user.username, user.name) for user in users] == [("erin", "Erin B"), ("frank", "Franklin")]
+    assert [feed.name for feed in users[0].selected_feeds] == ["StraitsTimes Tech"]
+    assert [feed.name for feed in users[1].selected_feeds] == ["ChannelNewsAsia World", "StraitsTimes Tech"]
+
+
+def test_update_missing_user_raises(database):
+    with pytest.raises(ValueError):
+        database.update("nobody", name="Nobody")
+
+
+def test_connection_is_shared_safely_across_threads(database):
+    def add_batch(start):
+        database.add_many((f"user{i}", f"User {i}", ["sport"]) for i in range(start, start + 50))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(add_batch, range(0, 200, 50)))
+
+    assert database.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert len(database.get_all()) == 200
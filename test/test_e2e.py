@@ -26,8 +26,8 @@ class MemoryDatabase:
         )
         self.user_record = User(username=username, name=name, selected_feeds=[feed])
 
-    def get_all(self):
-        return [self.user_record] if self.user_record else []
+    def iter_users(self):
+        return iter([self.user_record] if self.user_record else [])
 
 
 class StubIngester:
@@ -37,14 +37,14 @@ class StubIngester:
         StubIngester.instances.append(self)
         self.populate_called = False
 
-    def populate_feeds(self):
+    def populate_feeds(self, **_kwargs):
         self.populate_called = True
 
 
 class StubSummariser:
     instances = []
 
-    def __init__(self):
+    def __init__(self, **_kwargs):
         StubSummariser.instances.append(self)
 
     def summarise(self, users):
@@ -53,7 +53,7 @@ class StubSummariser:
 
 
 class StubTopExtractor:
-    def pick_top_articles(self, users):
+    def pick_top_articles(self, users, **_kwargs):
         for user in users:
             articles = []
             for feed in user.selected_feeds:
@@ -75,11 +75,12 @@ def test_cli_end_to_end(monkeypatch, tmp_path):
     monkeypatch.setattr(main_module, "Ingester", StubIngester)
     monkeypatch.setattr(main_module, "Summariser", StubSummariser)
     monkeypatch.setattr(main_module, "TopExtractor", StubTopExtractor)
+    monkeypatch.setattr(main_module.DigestApp, "CACHE_PATH", str(tmp_path / "cache.db"))
 
     def fake_get(*_args, **_kwargs):
         return DummyQuoteResponse()
 
-    monkeypatch.setattr(organiser_module.requests, "get", fake_get)
+    monkeypatch.setattr(organiser_module.HttpClient, "get", staticmethod(fake_get))
 
     output_path = tmp_path / "digest.md"
 
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from embedder import EmbeddingBackend, OnnxBackend, backend_name, make_backend
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+HEADLINES = [
+    "Singapore unveils budget measures to ease cost of living",
+    "MAS keeps monetary policy unchanged as inflation cools",
+    "Lions draw with Thailand in World Cup qualifier",
+    "Heavy rain triggers flash floods across eastern Singapore",
+]
+
+
+def test_mean_pool_ignores_padding_and_normalises():
+    hidden = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]])
+    mask = np.array([[1, 1, 0]])
+
+    pooled = OnnxBackend.mean_pool(hidden, mask)
+
+    np.testing.assert_allclose(pooled, [[1.0, 0.0]])
+    assert pooled.dtype == np.float32
+
+
+def test_backend_without_encode_fails_on_creation():
+    class Incomplete(EmbeddingBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_backend_name_needs_no_model():
+    assert backend_name("sentence-transformers", MODEL_NAME) == MODEL_NAME
+    assert backend_name("onnx-int8", MODEL_NAME) == f"{MODEL_NAME}:onnx-int8"
+    with pytest.raises(ValueError):
+        backend_name("tensorflow", MODEL_NAME)
+
+
+def test_make_backend_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        make_backend("tensorflow", MODEL_NAME)
+
+
+@pytest.mark.parametrize("kind, tolerance", [("onnx", 0.999), ("onnx-int8", 0.98)])
+def test_onnx_backend_matches_sentence_transformers(kind, tolerance):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("torch")
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    if getattr(sentence_transformers, "__file__", None) is None:
+        pytest.skip("sentence_transformers is stubbed in this session")
+    try:
+        reference = make_backend("sentence-transformers", MODEL_NAME).encode(HEADLINES)
+        candidate = make_backend(kind, MODEL_NAME).encode(HEADLINES)
+    except OSError as exc:  # model files unavailable offline
+        pytest.skip(f"model download failed: {exc}")
+
+    cosine = np.sum(reference * candidate, axis=1)
+
+    assert candidate.shape == reference.shape
+    assert cosine.min() >= tolerance
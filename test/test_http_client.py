@@ -0,0 +1,107 @@
+"""Tests for the shared HTTP client."""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import socket
+import threading
+
+import http_client as http_client_module
+from http_client import DnsCache, HttpClient
+
+
+def test_dns_cache_resolves_each_host_once(monkeypatch):
+    lookups = []
+
+    def fake_getaddrinfo(host, port, type=0):
+        lookups.append((host, port))
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", port))] * 2
+
+    DnsCache.clear()
+    monkeypatch.setattr(http_client_module.socket, "getaddrinfo", fake_getaddrinfo)
+
+    assert DnsCache.resolve("example.com", 443) == ["10.0.0.1"]
+    assert DnsCache.resolve("example.com", 443) == ["10.0.0.1"]
+    assert lookups == [("example.com", 443)]
+    DnsCache.clear()
+
+
+def test_shared_client_reuses_connections():
+    connections = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            connections.append(1)
+            super().setup()
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *_args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/feed"
+        assert HttpClient.shared() is HttpClient.shared()
+        bodies = [HttpClient.get(url, timeout=5).content for _ in range(3)]
+    finally:
+        HttpClient.close()
+        server.shutdown()
+        server.server_close()
+
+    assert bodies == [b"ok"] * 3
+    assert len(connections) == 1
+
+
+PROXY_VARIABLES = ("http_proxy", "https_proxy", "all_proxy", "no_proxy")
+
+
+def test_shared_client_honours_proxy_environment(monkeypatch):
+    proxied = []
+
+    class ProxyHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            proxied.append(self.path) # Absolute URI when used as a proxy
+            self.send_response(200)
+            self.send_header("Content-Length", "7")
+            self.end_headers()
+            self.wfile.write(b"proxied")
+
+        def log_message(self, *_args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ProxyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    for name in PROXY_VARIABLES:
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.delenv(name.upper(), raising=False)
+    monkeypatch.setenv("HTTP_PROXY", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv("NO_PROXY", "direct.invalid")
+    client = HttpClient.create()
+    try:
+        body = client.get("http://feeds.invalid/rss", timeout=5).content
+        direct = client._transport_for_url(http_client_module.httpx.URL("http://direct.invalid/rss"))
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+    assert body == b"proxied"
+    assert proxied == ["http://feeds.invalid/rss"]
+    assert direct is client._transport
+
+
+def test_direct_transport_uses_dns_cache():
+    # Relies on httpcore internals; pinned in requirements.txt.
+    client = HttpClient.create()
+    try:
+        assert isinstance(client._transport._pool._network_backend, http_client_module.CachingNetworkBackend)
+    finally:
+        client.close()
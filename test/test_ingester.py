@@ -4,6 +4,7 @@ from datetime import datetime, timezone
 from pathlib import Path
 from types import SimpleNamespace
 import sys
+import time
 
 import pytest
 
@@ -13,6 +14,7 @@ if str(SRC_PATH) not in sys.path:
     sys.path.append(str(SRC_PATH))
 
 import ingester as ingester_module  # noqa: E402
+from cache import ArticleStore, FeedCache  # noqa: E402
 from commons import Article  # noqa: E402
 
 
@@ -36,10 +38,17 @@ def test_fetch_feed_uses_feedparser(monkeypatch):
         {"title": "Story", "published": "Mon, 01 Jan 2024 00:00:00 GMT", "summary": "Snippet"}
     ]
 
-    def fake_parse(url):
+    def fake_get(url, timeout, headers):
         assert url == "https://example.com/feed"
+        assert headers == {}
+        assert timeout == ingester_module.Ingester.TIMEOUT
+        return SimpleNamespace(status_code=200, content=b"<rss />", raise_for_status=lambda: None)
+
+    def fake_parse(content):
+        assert content == b"<rss />"
         return SimpleNamespace(entries=sample_entries)
 
+    monkeypatch.setattr(ingester_module.HttpClient, "get", staticmethod(fake_get))
     monkeypatch.setattr(ingester_module.feedparser, "parse", fake_parse)
 
     articles = ingester_module.Ingester.fetch_feed("https://example.com/feed")
@@ -48,6 +57,42 @@ def test_fetch_feed_uses_feedparser(monkeypatch):
     assert articles[0].title == "Story"
 
 
+def test_fetch_feed_revalidates_with_cache(monkeypatch, tmp_path):
+    cache = FeedCache(str(tmp_path / "cache.db"))
+    requests_seen = []
+    parse_calls = []
+
+    def fake_get(url, timeout, headers):
+        requests_seen.append(headers)
+        if headers.get("If-None-Match") == '"v1"':
+            return SimpleNamespace(status_code=304, headers={}, raise_for_status=lambda: None)
+        return SimpleNamespace(
+            status_code=200,
+            content=b"<rss />",
+            headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+            raise_for_status=lambda: None,
+        )
+
+    def fake_parse(content):
+        parse_calls.append(content)
+        return SimpleNamespace(entries=[{"title": "Story", "link": "https://example.com/story"}])
+
+    monkeypatch.setattr(ingester_module.HttpClient, "get", staticmethod(fake_get))
+    monkeypatch.setattr(ingester_module.feedparser, "parse", fake_parse)
+
+    first = ingester_module.Ingester.fetch_feed("https://example.com/feed", cache=cache)
+    second = ingester_module.Ingester.fetch_feed("https://example.com/feed", cache=cache)
+    cache.close()
+
+    assert requests_seen == [
+        {},
+        {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"},
+    ]
+    assert len(parse_calls) == 1
+    assert second == first
+    assert second[0].url == "https://example.com/story"
+
+
 def test_filter_today_articles_respects_allowed_dates(monkeypatch):
     allowed_dt = datetime(2024, 1, 2, 8, 0, tzinfo=timezone.utc)
     allowed_date = allowed_dt.date()
@@ -75,6 +120,49 @@ def test_filter_today_articles_respects_allowed_dates(monkeypatch):
     assert [article.title for article in filtered] == ["Fresh"]
 
 
+def test_populate_feeds_reports_failed_feed(monkeypatch):
+    feeds = [
+        ingester_module.Feed(name="Good", tags=["good"], url="https://example.com/good"),
+        ingester_module.Feed(name="Bad", tags=["bad"], url="https://example.com/bad"),
+    ]
+    article = Article(title="Fresh", url="https://example.com/fresh", published="Mon, 01 Jan 2024 08:00:00 GMT")
+
+    def fake_fetch(url, timeout, cache=None):
+        if url.endswith("bad"):
+            raise TimeoutError("read timed out")
+        return [article]
+
+    monkeypatch.setattr(ingester_module.Ingester, "fetch_feed", staticmethod(fake_fetch))
+    monkeypatch.setattr(ingester_module.Ingester, "filter_today_articles", staticmethod(lambda articles: articles))
+
+    results = ingester_module.Ingester.populate_feeds(feeds)
+
+    assert [result.ok for result in results] == [True, False]
+    assert "TimeoutError" in results[1].error
+    assert feeds[0].article == [article]
+    assert feeds[1].article == []
+
+
+def test_populate_feeds_fetches_concurrently(monkeypatch):
+    feeds = [
+        ingester_module.Feed(name=f"Feed {i}", tags=[], url=f"https://example.com/{i}")
+        for i in range(6)
+    ]
+
+    def slow_fetch(_url, timeout, cache=None):
+        time.sleep(0.2)
+        return []
+
+    monkeypatch.setattr(ingester_module.Ingester, "fetch_feed", staticmethod(slow_fetch))
+
+    start = time.perf_counter()
+    results = ingester_module.Ingester.populate_feeds(feeds, max_workers=6)
+    elapsed = time.perf_counter() - start
+
+    assert all(result.ok for result in results)
+    assert elapsed < 0.2 * len(feeds) / 2
+
+
 def test_match_feeds_returns_unique_matches():
     matches = ingester_module.Ingester.match_feeds(["StraitsTimes Tech", "business"])
 
@@ -84,4 +172,39 @@ def test_match_feeds_returns_unique_matches():
         "StraitsTimes Tech",
         "StraitsTimes Business",
         "ChannelNewsAsia Business",
-    ]
\ No newline at end of file
+    ]
+
+def test_article_store_dedupes_across_runs_and_serves_the_window(tmp_path):
+    store = ArticleStore(str(tmp_path / "cache.db"))
+    since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    until = datetime(2024, 1, 3, tzinfo=timezone.utc)
+    fresh = Article(title="Fresh", url="https://Example.com/fresh/?utm_source=rss", published="Tue, 02 Jan 2024 08:00:00 GMT", summary="v1")
+    old = Article(title="Old", url="https://example.com/old", published="Sat, 30 Dec 2023 08:00:00 GMT")
+
+    first = store.upsert("World", [fresh, old])
+    again = store.upsert("World", [Article(title="Fresh", url="https://example.com/fresh#top", published=fresh.published, summary="v1")])
+    edited = store.upsert("Asia", [Article(title="Fresh", url=fresh.url, published=fresh.published, summary="v2")])
+    window = store.window("World", since, until)
+    store.close()
+
+    assert [article.title for article in first] == ["Fresh", "Old"]
+    assert again == []
+    assert [article.summary for article in edited] == ["v2"]
+    assert [(article.title, article.summary) for article in window] == [("Fresh", "v2")]
+
+
+def test_populate_feeds_reads_window_from_store(monkeypatch, tmp_path):
+    store = ArticleStore(str(tmp_path / "cache.db"))
+    feed = ingester_module.Feed(name="Local", tags=[], url="https://example.com/feed")
+    today = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
+    served = [[Article(title="First", url="https://example.com/1", published=today)], [Article(title="Second", url="https://example.com/2", published=today)]]
+
+    monkeypatch.setattr(ingester_module.Ingester, "fetch_feed", staticmethod(lambda _url, timeout, cache=None: served.pop(0)))
+
+    first = ingester_module.Ingester.populate_feeds([feed], store=store)
+    second = ingester_module.Ingester.populate_feeds([feed], store=store)
+    store.close()
+
+    assert first[0].new_articles == 1 and second[0].new_articles == 1
+    # First dropped off the feed but is still inside the window.
+    assert sorted(article.title for article in feed.article) == ["First", "Second"]
@@ -46,7 +46,7 @@ def test_summary_to_digest_flow(tmp_path, monkeypatch):
     def fake_get(*_args, **_kwargs):
         return DummyQuoteResponse()
 
-    monkeypatch.setattr(organiser_module.requests, "get", fake_get)
+    monkeypatch.setattr(organiser_module.HttpClient, "get", staticmethod(fake_get))
 
     output_path = tmp_path / "integration.md"
     organiser_module.Organiser.build(user=user, output_file=str(output_path))
@@ -1,5 +1,4 @@
 from pathlib import Path
-from types import SimpleNamespace
 
 import main as main_module
 from commons import Article, Feed, User
@@ -19,7 +18,7 @@ def test_digest_app_run_executes_pipeline(monkeypatch, tmp_path):
             add_calls.append((username, name, tuple(selected_feeds)))
             self.added = True
 
-        def get_all(self):
+        def iter_users(self):
             feed = Feed(
                 name="Sample Feed",
                 tags=["sample"],
@@ -27,17 +26,17 @@ def test_digest_app_run_executes_pipeline(monkeypatch, tmp_path):
                 article=[Article(title="Story", url="https://example.com/story", summary="Summary")],
             )
             user = User(username="default_user", name="Morning Reader", selected_feeds=[feed], summary="")
-            return [user]
+            yield user
 
     class FakeIngester:
         def __init__(self):
             self.populate_called = False
 
-        def populate_feeds(self):
+        def populate_feeds(self, **_kwargs):
             self.populate_called = True
 
     class FakeSummariser:
-        def __init__(self):
+        def __init__(self, **_kwargs):
             self.called_with = None
 
         def summarise(self, users):
@@ -49,11 +48,20 @@ def test_digest_app_run_executes_pipeline(monkeypatch, tmp_path):
 
     class FakeOrganiser:
         @staticmethod
-        def build(user, output_file):
-            built_users.append((user.username, user.summary, output_file))
+        def render_context(**_kwargs):
+            return "shared-context"
+
+        @staticmethod
+        def render(user, context=None):
+            built_users.append((user.username, user.summary, context))
+            return f"digest for {user.username}"
+
+        @staticmethod
+        def write_many(outputs):
+            return [main_module.WriteResult(path, len(text), 0.0) for path, text in outputs]
 
     class FakeTopExtractor:
-        def pick_top_articles(self, users):
+        def pick_top_articles(self, users, **_kwargs):
             for user in users:
                 articles = []
                 for feed in user.selected_feeds:
@@ -66,14 +74,15 @@ def test_digest_app_run_executes_pipeline(monkeypatch, tmp_path):
     monkeypatch.setattr(main_module, "Summariser", FakeSummariser)
     monkeypatch.setattr(main_module, "Organiser", FakeOrganiser)
     monkeypatch.setattr(main_module, "TopExtractor", FakeTopExtractor)
+    monkeypatch.setattr(main_module.DigestApp, "CACHE_PATH", str(tmp_path / "cache.db"))
 
     app = main_module.DigestApp()
-    app.parser.parse_args = lambda _argv: SimpleNamespace(output=str(tmp_path / "digest.md"))
 
-    app.run([])
+    app.run(["--output", str(tmp_path / "digest.md")])
 
     assert add_calls and add_calls[0][0] == main_module.DigestApp.DEFAULT_USERNAME
     assert built_users and built_users[0][1] == "Unit test summary"
+    assert built_users[0][2] == "shared-context"
 
 
 def test_output_path_variants(tmp_path):
@@ -83,3 +92,106 @@ def test_output_path_variants(tmp_path):
 
     assert default_path.endswith("morning_digest_alice.md")
     assert custom_path.endswith("custom_alice.md")
+
+
+def _install_incremental_fakes(monkeypatch, tmp_path, users, summarised, failing):
+    """Fakes for repeated runs over users; summaries of readers named in failing fail."""
+
+    class FakeDatabase:
+        def is_present(self, _username):
+            return True
+
+        def iter_users(self):
+            return iter(users)
+
+    class FakeIngester:
+        def populate_feeds(self, **_kwargs):
+            pass
+
+    class FakeSummariser:
+        def __init__(self, **_kwargs):
+            pass
+
+        def summarise(self, readers):
+            summarised.append([reader.name for reader in readers])
+            for reader in readers:
+                # Summariser leaves the summary unset when the model call fails.
+                reader.summary = None if reader.name in failing else "Summary"
+
+    class FakeOrganiser:
+        @staticmethod
+        def render_context(**_kwargs):
+            return None
+
+        @staticmethod
+        def render(user, context=None):
+            return f"digest for {user.username}"
+
+        @staticmethod
+        def write_many(outputs):
+            results = []
+            for path, text in outputs:
+                Path(path).write_text(text)
+                results.append(main_module.WriteResult(path, len(text), 0.0))
+            return results
+
+    class FakeTopExtractor:
+        def pick_top_articles(self, readers, **_kwargs):
+            for reader in readers:
+                reader.top_articles = [article for feed in reader.selected_feeds for article in feed.article]
+
+    monkeypatch.setattr(main_module, "Database", FakeDatabase)
+    monkeypatch.setattr(main_module, "Ingester", FakeIngester)
+    monkeypatch.setattr(main_module, "Summariser", FakeSummariser)
+    monkeypatch.setattr(main_module, "Organiser", FakeOrganiser)
+    monkeypatch.setattr(main_module, "TopExtractor", FakeTopExtractor)
+    monkeypatch.setattr(main_module.DigestApp, "CACHE_PATH", str(tmp_path / "cache.db"))
+
+    def run(incremental):
+        argv = ["--output", str(tmp_path / "digest.md")]
+        main_module.DigestApp().run(argv + ["--incremental"] if incremental else argv)
+
+    return run
+
+
+def _feeds():
+    world = Feed(name="World", tags=[], url="https://example.com/world", article=[Article(title="Summit opens", url="https://example.com/summit")])
+    sport = Feed(name="Sport", tags=[], url="https://example.com/sport", article=[Article(title="Cup final", url="https://example.com/cup")])
+    return world, sport
+
+
+def test_incremental_run_rebuilds_only_changed_profiles(monkeypatch, tmp_path):
+    world, sport = _feeds()
+    users = [
+        User(username="default_user", name="Ann", selected_feeds=[world]),
+        User(username="ben", name="Ben", selected_feeds=[sport]),
+    ]
+    summarised = []
+    run = _install_incremental_fakes(monkeypatch, tmp_path, users, summarised, failing=set())
+
+    run(incremental=False)
+    run(incremental=True)
+    sport.article = [Article(title="Cup final result", url="https://example.com/cup-result")]
+    run(incremental=True)
+    (tmp_path / "digest_ann.md").unlink()
+    run(incremental=True)
+
+    assert summarised == [["Ann", "Ben"], ["Ben"], ["Ann"]]
+
+
+def test_incremental_run_retries_profiles_whose_summary_failed(monkeypatch, tmp_path):
+    world, sport = _feeds()
+    users = [
+        User(username="default_user", name="Ann", selected_feeds=[world]),
+        User(username="ben", name="Ben", selected_feeds=[sport]),
+    ]
+    summarised = []
+    failing = {"Ben"}
+    run = _install_incremental_fakes(monkeypatch, tmp_path, users, summarised, failing)
+
+    run(incremental=False)
+    failing.clear()
+    run(incremental=True)
+    run(incremental=True)
+
+    assert summarised == [["Ann", "Ben"], ["Ben"]]
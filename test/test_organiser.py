@@ -1,5 +1,8 @@
+from pathlib import Path
 from types import SimpleNamespace
 
+import pytest
+
 import organiser as organiser_module
 from organiser import Headline, Organiser
 
@@ -29,7 +32,7 @@ def test_build_creates_digest(tmp_path, monkeypatch, sample_user):
     def fake_get(*_args, **_kwargs):
         return DummyQuoteResponse()
 
-    monkeypatch.setattr(organiser_module.requests, "get", fake_get)
+    monkeypatch.setattr(organiser_module.HttpClient, "get", staticmethod(fake_get))
 
     output_file = tmp_path / "digest.md"
     Organiser.build(user=sample_user, output_file=str(output_file))
@@ -38,3 +41,120 @@ def test_build_creates_digest(tmp_path, monkeypatch, sample_user):
     assert sample_user.name in rendered
     assert "Sample personalised summary." in rendered
     assert "Sample Story" in rendered
+
+
+def test_render_context_is_shared_across_users(tmp_path, monkeypatch, sample_user):
+    quote_requests = []
+    logo_reads = []
+
+    def fake_get(*_args, **_kwargs):
+        quote_requests.append(1)
+        return DummyQuoteResponse()
+
+    monkeypatch.setattr(organiser_module.HttpClient, "get", staticmethod(fake_get))
+    monkeypatch.setattr(Organiser, "build_logo", staticmethod(lambda: logo_reads.append(1) or "<img />"))
+
+    context = Organiser.render_context(logo_mode="inline")
+    for name in ("Alice", "Bob", "Carol"):
+        sample_user.name = name
+        Organiser.build(user=sample_user, output_file=str(tmp_path / f"{name}.md"), context=context)
+
+    assert len(quote_requests) == 1
+    assert len(logo_reads) == 1
+    rendered = (tmp_path / "Bob.md").read_text(encoding="utf-8")
+    assert "The Morning Digest for Bob" in rendered
+    assert "Sail towards the sunrise." in rendered
+
+
+def test_external_logo_is_written_once_under_a_hashed_name(tmp_path, monkeypatch, sample_user):
+    monkeypatch.setattr(organiser_module.HttpClient, "get", staticmethod(lambda *_args, **_kwargs: DummyQuoteResponse()))
+
+    first = Organiser.render_context(output_dir=str(tmp_path))
+    second = Organiser.render_context(output_dir=str(tmp_path))
+    Organiser.build(user=sample_user, output_file=str(tmp_path / "digest.md"), context=first)
+
+    assets = list((tmp_path / Organiser.ASSET_DIR).iterdir())
+    assert len(assets) == 1
+    assert assets[0].suffix == ".webp"
+    assert first.logo_html == second.logo_html
+    assert f"src='{Organiser.ASSET_DIR}/{assets[0].name}'" in first.logo_html
+    assert (tmp_path / "digest.md").stat().st_size < 20_000
+
+
+def test_digest_escapes_titles_and_summaries(monkeypatch, sample_user):
+    monkeypatch.setattr(organiser_module.HttpClient, "get", staticmethod(lambda *_args, **_kwargs: DummyQuoteResponse()))
+    monkeypatch.setattr(Organiser, "build_logo", staticmethod(lambda: "<img src='logo' />"))
+
+    context = Organiser.render_context(logo_mode="inline")
+    content = organiser_module.DigestContent(
+        name="Bob",
+        summary="Stocks <b>soar</b> & bonds slip.",
+        sponsor_name=Organiser.SPONSOR_NAME,
+        sponsor_message=Organiser.SPONSOR_MESSAGE,
+        partnership_message=Organiser.PARTNERSHIP_MESSAGE,
+        top_headlines=[Headline(title="<script>alert(1)</script>", url="https://example.com/?a=1&b=2")],
+    )
+    rendered = Organiser._compose_markdown(content, context)
+
+    assert "<script>" not in rendered
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in rendered
+    assert "Stocks &lt;b&gt;soar&lt;/b&gt; &amp; bonds slip." in rendered
+    assert "https://example.com/?a=1&amp;b=2" in rendered
+    # Shared fragments are trusted markup and pass through untouched.
+    assert "<img src='logo' />" in rendered
+
+
+def test_digest_template_is_compiled_once():
+    assert Organiser.digest_template() is Organiser.digest_template()
+
+
+def test_write_many_replaces_atomically_and_skips_unchanged(tmp_path):
+    outputs = [(str(tmp_path / f"digest_{i}.md"), f"digest {i}") for i in range(5)]
+
+    first = Organiser.write_many(outputs)
+    (tmp_path / "digest_0.md").write_text("stale", encoding="utf-8")
+    second = Organiser.write_many(outputs)
+
+    assert [result.path for result in first] == [path for path, _text in outputs]
+    assert all(not result.unchanged and result.bytes_written == len("digest 0") for result in first)
+    assert [result.unchanged for result in second] == [False, True, True, True, True]
+    assert (tmp_path / "digest_0.md").read_text(encoding="utf-8") == "digest 0"
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"digest_{i}.md" for i in range(5)]
+
+
+def test_failed_write_keeps_previous_digest(tmp_path, monkeypatch):
+    output_file = tmp_path / "digest.md"
+    output_file.write_text("yesterday", encoding="utf-8")
+
+    def broken_replace(*_args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(organiser_module.os, "replace", broken_replace)
+    with pytest.raises(OSError, match="disk full"):
+        Organiser._write(str(output_file), "today")
+
+    assert output_file.read_text(encoding="utf-8") == "yesterday"
+    assert [path.name for path in tmp_path.iterdir()] == ["digest.md"]
+
+
+def test_render_parallel_matches_serial_render(tmp_path, monkeypatch, sample_user):
+    monkeypatch.setattr(organiser_module.HttpClient, "get", staticmethod(lambda *_args, **_kwargs: DummyQuoteResponse()))
+    context = Organiser.render_context(output_dir=str(tmp_path))
+    users = []
+    for i in range(5):
+        user = organiser_module.User(
+            username=f"user{i}",
+            name=f"Reader {i}",
+            selected_feeds=sample_user.selected_feeds,
+            summary=f"Summary <{i}>",
+            top_articles=sample_user.top_articles,
+        )
+        users.append(user)
+    jobs = [(str(tmp_path / f"digest_{i}.md"), user) for i, user in enumerate(users)]
+
+    results, reports = Organiser.render_parallel(iter(jobs), context, workers=2, chunk_size=2)
+
+    assert [result.path for result in results] == [path for path, _user in jobs]
+    assert sum(report.digests for report in reports) == 5
+    for path, user in jobs:
+        assert Path(path).read_text(encoding="utf-8") == Organiser.render(user, context)
@@ -0,0 +1,37 @@
+from commons import Article, Feed, User
+from profiles import Profiles
+
+
+def _feed(name):
+    return Feed(name=name, tags=[], url=f"https://example.com/{name}", article=[Article(title=name, url="")])
+
+
+def test_users_with_the_same_feeds_share_a_profile():
+    world, sport, tech = _feed("World"), _feed("Sport"), _feed("Tech")
+    users = [
+        User(username="a", name="Ann", selected_feeds=[world, sport]),
+        User(username="b", name="Ben", selected_feeds=[tech]),
+        User(username="c", name="Cat", selected_feeds=[sport, world]),
+        User(username="d", name="Dan", selected_feeds=[world, sport]),
+    ]
+
+    profiles = Profiles.group(users)
+
+    assert [profile.key for profile in profiles] == [("Sport", "World"), ("Tech",)]
+    assert [[user.username for user in profile.members] for profile in profiles] == [["a", "c", "d"], ["b"]]
+    assert profiles[0].reader.selected_feeds == [world, sport]
+    assert profiles[0].reader.name == "Ann +2"
+
+
+def test_fan_out_attaches_profile_results_to_every_member():
+    world = _feed("World")
+    users = [User(username=name, name=name, selected_feeds=[world]) for name in ("a", "b", "c")]
+    profiles = Profiles.group(users)
+
+    for reader in Profiles.readers(profiles):
+        reader.top_articles = world.article
+        reader.summary = "Shared summary"
+    ready = list(Profiles.fan_out(profiles, Profiles.readers(profiles)))
+
+    assert ready == users
+    assert all(user.summary == "Shared summary" and user.top_articles == world.article for user in users)
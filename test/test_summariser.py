@@ -1,9 +1,12 @@
 from types import SimpleNamespace
+import time
 
 import pytest
 
+import cache as cache_module
 import summariser as summariser_module
-from commons import Article, Feed
+from cache import ResponseCache
+from commons import Article, Feed, User
 
 
 class DummyResponses:
@@ -60,3 +63,352 @@ def test_check_api_key_missing(monkeypatch):
 
     with pytest.raises(EnvironmentError):
         summariser_module.Summariser.check_api_key()
+
+
+def test_summarise_runs_users_concurrently(monkeypatch, sample_feed):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    users = [User(username=f"user{i}", name=f"User {i}", selected_feeds=[sample_feed]) for i in range(6)]
+
+    summariser = summariser_module.Summariser(model="mock", max_workers=6)
+
+    def slow_invoke(instructions, prompt):
+        time.sleep(0.2)
+        return "Summary"
+
+    summariser.invoke_model = slow_invoke  # type: ignore[assignment]
+
+    start = time.perf_counter()
+    summariser.summarise(users)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.2 * len(users) / 2
+    assert [user.summary for user in users] == ["Summary"] * len(users)
+
+
+def test_invoke_with_retry_backs_off_on_rate_limit(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(summariser_module.time, "sleep", lambda seconds: delays.append(seconds))
+    delays = []
+    attempts = []
+
+    class RateLimited(Exception):
+        status_code = 429
+
+    def flaky_invoke(instructions, prompt):
+        attempts.append(prompt)
+        if len(attempts) < 3:
+            raise RateLimited("slow down")
+        return "Finally"
+
+    summariser = summariser_module.Summariser(model="mock")
+    summariser.invoke_model = flaky_invoke  # type: ignore[assignment]
+
+    assert summariser.invoke_with_retry("instructions", "prompt") == "Finally"
+    assert len(attempts) == 3
+    assert len(delays) == 2 and delays[1] > delays[0] * 0.9
+
+
+@pytest.mark.parametrize("error", ["503", "connection"])
+def test_invoke_with_retry_retries_transient_errors(monkeypatch, error):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(summariser_module.time, "sleep", lambda _seconds: None)
+    attempts = []
+
+    class Unavailable(Exception):
+        status_code = 503
+
+    class Dropped(summariser_module.APIConnectionError):
+        def __init__(self):
+            Exception.__init__(self, "dropped")
+
+    def flaky_invoke(instructions, prompt):
+        attempts.append(prompt)
+        if len(attempts) == 1:
+            raise Unavailable("busy") if error == "503" else Dropped()
+        return "Recovered"
+
+    summariser = summariser_module.Summariser(model="mock")
+    summariser.invoke_model = flaky_invoke  # type: ignore[assignment]
+
+    assert summariser.invoke_with_retry("instructions", "prompt") == "Recovered"
+    assert len(attempts) == 2
+
+
+def test_invoke_with_retry_does_not_retry_client_errors(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    attempts = []
+
+    class BadRequest(Exception):
+        status_code = 400
+
+    def invoke(instructions, prompt):
+        attempts.append(prompt)
+        raise BadRequest("invalid")
+
+    summariser = summariser_module.Summariser(model="mock")
+    summariser.invoke_model = invoke  # type: ignore[assignment]
+
+    with pytest.raises(BadRequest):
+        summariser.invoke_with_retry("instructions", "prompt")
+    assert len(attempts) == 1
+
+
+def test_summarise_keeps_going_when_one_user_fails(monkeypatch, sample_feed):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    ok_user = User(username="ok", name="Ok", selected_feeds=[sample_feed])
+    broken_feed = Feed(name="Broken", tags=[], url="", article=[Article(title="Stuck", url="")])
+    bad_user = User(username="bad", name="Bad", selected_feeds=[broken_feed])
+
+    summariser = summariser_module.Summariser(model="mock")
+
+    def invoke(instructions, prompt):
+        if prompt.startswith("Broken"):
+            raise TimeoutError("request timed out")
+        return " Fine "
+
+    summariser.invoke_model = invoke  # type: ignore[assignment]
+    summariser.summarise([bad_user, ok_user])
+
+    assert bad_user.summary is None
+    assert ok_user.summary == "Fine"
+
+
+def test_summarise_calls_model_once_per_distinct_prompt(monkeypatch, sample_feed):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    other_feed = Feed(
+        name="Other Feed",
+        tags=["other"],
+        url="https://example.com/other",
+        article=[Article(title="Other Story", url="https://example.com/other-story", summary="Other")],
+    )
+    users = [
+        User(username="a", name="A", selected_feeds=[sample_feed]),
+        User(username="b", name="B", selected_feeds=[sample_feed]),
+        User(username="c", name="C", selected_feeds=[other_feed]),
+        User(username="d", name="D", selected_feeds=[sample_feed]),
+    ]
+    prompts = []
+
+    summariser = summariser_module.Summariser(model="mock")
+
+    def invoke(instructions, prompt):
+        prompts.append(prompt)
+        return f"Summary of {prompt.split(':')[0]}"
+
+    summariser.invoke_model = invoke  # type: ignore[assignment]
+    summariser.summarise(users)
+
+    assert sorted(prompts) == sorted(summariser_module.Summariser.feed_to_str(feeds) for feeds in ([sample_feed], [other_feed]))
+    assert [user.summary for user in users] == [
+        "Summary of Sample Feed",
+        "Summary of Sample Feed",
+        "Summary of Other Feed",
+        "Summary of Sample Feed",
+    ]
+
+
+def test_response_cache_serves_repeat_runs(monkeypatch, tmp_path, sample_user):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    calls = []
+
+    def run_once(bypass=False):
+        cache = ResponseCache(str(tmp_path / "cache.db"), bypass=bypass)
+        summariser = summariser_module.Summariser(model="mock", cache=cache)
+
+        def invoke(instructions, prompt):
+            calls.append(prompt)
+            return f"Summary {len(calls)}"
+
+        summariser.invoke_model = invoke  # type: ignore[assignment]
+        summariser.summarise([sample_user])
+        cache.close()
+        return cache
+
+    first = run_once()
+    assert sample_user.summary == "Summary 1"
+    second = run_once()
+    assert sample_user.summary == "Summary 1"
+    third = run_once(bypass=True)
+    assert sample_user.summary == "Summary 2"
+
+    assert len(calls) == 2
+    assert (first.hits, first.misses) == (0, 1)
+    assert (second.hits, second.misses) == (1, 0)
+    assert (third.hits, third.misses) == (0, 1)
+
+
+def test_response_cache_expires_and_evicts(tmp_path, monkeypatch):
+    now = [1000.0]
+    cache = ResponseCache(str(tmp_path / "cache.db"), ttl=60, max_entries=2)
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+
+    cache.put("a", "A")
+    now[0] += 1
+    cache.put("b", "B")
+    now[0] += 1
+    assert cache.get("a") == "A"  # refreshes a, so b is now least recently used
+    now[0] += 1
+    cache.put("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    now[0] += 120
+    assert cache.get("c") is None
+    cache.close()
+
+
+def test_build_prompt_prefers_ranked_articles_within_budget(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    articles = [
+        Article(title=f"Story {i}", url=f"https://example.com/{i}", summary="word " * 200)
+        for i in range(10)
+    ]
+    feed = Feed(name="Feed", tags=[], url="https://example.com/feed", article=articles)
+    user = User(username="u", name="U", selected_feeds=[feed], top_articles=[articles[7], articles[3]])
+
+    summariser = summariser_module.Summariser(model="mock", token_budget=250)
+    prompt = summariser.build_prompt(user)
+
+    lines = prompt.text.split("\n\n")
+    assert lines[0].startswith("Feed: Story 7: ")
+    assert lines[1].startswith("Feed: Story 3: ")
+    assert all(len(line) < 320 for line in lines)
+    assert prompt.tokens <= 250
+    assert prompt.articles == len(lines) == 3
+    assert prompt.dropped == 7
+
+
+def test_build_prompt_drops_near_duplicate_headlines(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    vectors = {
+        "Budget unveiled": [1.0, 0.0],
+        "Budget unveiled in Parliament": [0.99, 0.05],
+        "Lions win": [0.0, 1.0],
+    }
+    feed = Feed(
+        name="Feed",
+        tags=[],
+        url="https://example.com/feed",
+        article=[Article(title=title, url="https://example.com", summary="") for title in vectors]
+        + [Article(title="Lions win", url="https://example.com", summary="")],
+    )
+    user = User(username="u", name="U", selected_feeds=[feed])
+
+    summariser = summariser_module.Summariser(
+        model="mock",
+        embedder=lambda titles: [vectors[title] for title in titles],
+    )
+    prompt = summariser.build_prompt(user)
+
+    assert prompt.text == "Feed: Budget unveiled: \n\nFeed: Lions win: "
+    assert prompt.dropped == 2
+
+
+def test_map_reduce_summarises_each_feed_once(monkeypatch, sample_feed):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    other_feed = Feed(
+        name="Other Feed",
+        tags=["other"],
+        url="https://example.com/other",
+        article=[Article(title="Other Story", url="https://example.com/other-story", summary="Other")],
+    )
+    users = [
+        User(username="a", name="A", selected_feeds=[sample_feed, other_feed]),
+        User(username="b", name="B", selected_feeds=[sample_feed]),
+        User(username="c", name="C", selected_feeds=[other_feed, sample_feed]),
+    ]
+    calls = []
+
+    summariser = summariser_module.Summariser(model="mock", mode="map-reduce")
+
+    def invoke(instructions, prompt):
+        calls.append((instructions, prompt))
+        if instructions == summariser.FEED_INSTRUCTIONS:
+            return f"- notes on {prompt.split(':')[0]}"
+        return "Digest from " + " + ".join(line for line in prompt.split("\n") if line.startswith("- "))
+
+    summariser.invoke_model = invoke  # type: ignore[assignment]
+    summariser.summarise(users)
+
+    map_calls = [prompt for instructions, prompt in calls if instructions == summariser.FEED_INSTRUCTIONS]
+    reduce_calls = [prompt for instructions, prompt in calls if instructions == summariser.INSTRUCTIONS]
+    assert sorted(prompt.split(":")[0] for prompt in map_calls) == ["Other Feed", "Sample Feed"]
+    assert len(reduce_calls) == 3
+    assert users[0].summary == "Digest from - notes on Sample Feed + - notes on Other Feed"
+    assert users[1].summary == "Digest from - notes on Sample Feed"
+    assert users[2].summary == "Digest from - notes on Other Feed + - notes on Sample Feed"
+
+
+def test_invoke_model_stream_joins_text_deltas(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    requests_seen = []
+
+    def create(**kwargs):
+        requests_seen.append(kwargs)
+        return iter([
+            SimpleNamespace(type="response.created"),
+            SimpleNamespace(type="response.output_text.delta", delta="Good "),
+            SimpleNamespace(type="response.output_text.delta", delta="morning"),
+            SimpleNamespace(type="response.completed"),
+        ])
+
+    monkeypatch.setattr(summariser_module.Summariser, "CLIENT", SimpleNamespace(responses=SimpleNamespace(create=create)))
+    summariser = summariser_module.Summariser(model="mock", stream=True)
+
+    assert summariser.invoke_model("instructions", "prompt") == "Good morning"
+    assert requests_seen[0]["stream"] is True
+
+
+def test_summarise_iter_yields_fast_summaries_first(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    feeds = {
+        name: Feed(name=name, tags=[], url="", article=[Article(title=name, url="")])
+        for name in ("Slow", "Fast")
+    }
+    users = [
+        User(username="slow", name="Slow", selected_feeds=[feeds["Slow"]]),
+        User(username="fast", name="Fast", selected_feeds=[feeds["Fast"]]),
+        User(username="none", name="None", selected_feeds=[]),
+    ]
+
+    summariser = summariser_module.Summariser(model="mock", max_workers=2)
+
+    def invoke(instructions, prompt):
+        if prompt.startswith("Slow"):
+            time.sleep(0.3)
+        return f"{prompt.split(':')[0]} summary"
+
+    summariser.invoke_model = invoke  # type: ignore[assignment]
+
+    order = [(user.username, user.summary) for user in summariser.summarise_iter(users)]
+
+    assert order == [("none", None), ("fast", "Fast summary"), ("slow", "Slow summary")]
+
+
+def test_openai_client_is_rebuilt_after_http_client_close(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(summariser_module.Summariser, "CLIENT", None)
+    monkeypatch.setattr(summariser_module.Summariser, "_client", None)
+    monkeypatch.setattr(summariser_module.Summariser, "_client_http", None)
+    HttpClient = summariser_module.HttpClient
+
+    first = summariser_module.Summariser.openai_client()
+    assert summariser_module.Summariser.openai_client() is first
+    HttpClient.close()
+    second = summariser_module.Summariser.openai_client()
+
+    assert second is not first
+    assert summariser_module.Summariser._client_http is HttpClient.shared()
+    assert not HttpClient.shared().is_closed
+    assert getattr(second, "max_retries", 0) == 0 # Rate limits are retried by invoke_with_retry only
+
+
+def test_reduce_prompt_counts_feed_sections(monkeypatch, sample_feed):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    quiet_feed = Feed(name="Quiet Feed", tags=[], url="https://example.com/quiet", article=[])
+    user = User(username="a", name="A", selected_feeds=[sample_feed, quiet_feed])
+
+    prompt = summariser_module.Summariser(model="mock").reduce_prompt(user, {"Sample Feed": "- notes"})
+
+    assert prompt.text == "Sample Feed:\n- notes"
+    assert (prompt.articles, prompt.dropped, prompt.unit) == (1, 1, "feed section")
@@ -74,6 +74,7 @@ _ensure_sentence_transformers_stub()
 _ensure_sklearn_stub()
 _ensure_hdbscan_stub()
 
+from cache import ClusterCache, EmbeddingCache
 from top_extractor import TopExtractor
 
 
@@ -117,23 +118,19 @@ def test_pick_top_articles_runs_pipeline(monkeypatch):
 
     captured_calls = {}
 
-    medoid_embeddings = np.array([[1.0, 0.0]])
-
-    def fake_embed(texts):
+    def fake_embed(texts, cache=None):
         captured_calls.setdefault("embed_texts", []).append(list(texts))
         if texts == headlines:
             return fake_embeddings
-        if list(texts) == ["Headline B"]:
-            return medoid_embeddings
         raise AssertionError("Unexpected embed input")
 
     def fake_cluster_headlines(embeddings, min_cluster_size=4):
         captured_calls["cluster_headlines_input"] = embeddings
         return fake_labels
 
-    def fake_cluster_medoids(headlines_arg, embeddings_arg, labels_arg):
-        captured_calls["cluster_medoids_args"] = (headlines_arg, embeddings_arg, labels_arg)
-        return ["Headline B"]
+    def fake_cluster_medoid_indices(embeddings_arg, labels_arg):
+        captured_calls["cluster_medoids_args"] = (embeddings_arg, labels_arg)
+        return [1]
 
     def fake_mmr_select(candidates, embeddings, top_n=TopExtractor.TOP_N, lambda_param=1.0):
         captured_calls["mmr_args"] = (candidates, embeddings, top_n, lambda_param)
@@ -141,7 +138,7 @@ def test_pick_top_articles_runs_pipeline(monkeypatch):
 
     monkeypatch.setattr(TopExtractor, "embed", staticmethod(fake_embed))
     monkeypatch.setattr(TopExtractor, "cluster_headlines", staticmethod(fake_cluster_headlines))
-    monkeypatch.setattr(TopExtractor, "cluster_medoids", staticmethod(fake_cluster_medoids))
+    monkeypatch.setattr(TopExtractor, "cluster_medoid_indices", staticmethod(fake_cluster_medoid_indices))
     monkeypatch.setattr(TopExtractor, "mmr_select", staticmethod(fake_mmr_select))
 
     user = SimpleNamespace(
@@ -160,16 +157,275 @@ def test_pick_top_articles_runs_pipeline(monkeypatch):
     TopExtractor.pick_top_articles([user])
 
     assert [article.title for article in user.top_articles] == ["Headline B"]
-    assert captured_calls["embed_texts"][0] == headlines
+    # Medoid embeddings are taken by index, so headlines are encoded only once.
+    assert captured_calls["embed_texts"] == [headlines]
     np.testing.assert_array_equal(captured_calls["cluster_headlines_input"], fake_embeddings)
 
-    ch_headlines, ch_embeddings, ch_labels = captured_calls["cluster_medoids_args"]
-    assert ch_headlines == headlines
+    ch_embeddings, ch_labels = captured_calls["cluster_medoids_args"]
     np.testing.assert_array_equal(ch_embeddings, fake_embeddings)
     np.testing.assert_array_equal(ch_labels, fake_labels)
 
     candidates, candidate_embeddings, top_n, lambda_param = captured_calls["mmr_args"]
     assert candidates == ["Headline B"]
-    np.testing.assert_array_equal(candidate_embeddings, medoid_embeddings)
+    np.testing.assert_array_equal(candidate_embeddings, fake_embeddings[[1]])
     assert top_n == TopExtractor.TOP_N
     assert lambda_param == 1.0
+
+
+def test_embed_reuses_cached_vectors(tmp_path):
+    encoded = []
+
+    def fake_encode(texts):
+        encoded.append(list(texts))
+        return np.array([[float(len(text)), 1.0] for text in texts])
+
+    cache = EmbeddingCache(str(tmp_path / "cache.db"))
+    first = cache.encode("model", ["Rain today", "Rain  today", "Sun"], fake_encode)
+    second = cache.encode("model", ["Sun", "Rain today"], fake_encode)
+    cache.close()
+
+    reloaded = EmbeddingCache(str(tmp_path / "cache.db"))
+    third = reloaded.encode("model", ["Sun"], fake_encode)
+    reloaded.close()
+
+    assert encoded == [["Rain today", "Sun"]]
+    np.testing.assert_array_equal(first[0], first[1])
+    np.testing.assert_array_equal(second, first[[2, 0]])
+    np.testing.assert_array_equal(third, first[[2]])
+    assert (cache.hits, cache.misses) == (3, 2)
+    assert (reloaded.hits, reloaded.misses) == (1, 0)
+
+
+def test_embedding_cache_prunes_vectors_unused_since_cutoff(monkeypatch, tmp_path):
+    import sqlite3
+    from datetime import datetime, timezone
+
+    import cache as cache_module
+
+    path = tmp_path / "cache.db"
+    # A cache written before accessed_at existed
+    legacy = sqlite3.connect(path)
+    legacy.execute("CREATE TABLE embedding_cache (model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (model, text_hash))")
+    legacy.execute("INSERT INTO embedding_cache VALUES ('model', ?, ?)", (EmbeddingCache.text_hash("Old"), np.ones(2, dtype=np.float32).tobytes()))
+    legacy.commit()
+    legacy.close()
+
+    clock = iter([1000.0, 1000.0, 5000.0, 5000.0])
+    monkeypatch.setattr(cache_module.time, "time", lambda: next(clock))
+    encode = lambda texts: np.zeros((len(texts), 2))
+    cache = EmbeddingCache(str(path)) # Migrated at t=1000
+    cache.encode("model", ["Stale"], encode) # Stored at t=1000
+    cache.encode("model", ["Fresh"], encode) # Stored at t=5000
+    cache.close()
+    cache = EmbeddingCache(str(path))
+    cache.encode("model", ["Old"], encode) # Loaded from disk, touched at t=5000
+
+    pruned = cache.prune(datetime.fromtimestamp(2000, timezone.utc))
+
+    assert pruned == 1
+    remaining = {row[0] for row in cache.conn.execute("SELECT text_hash FROM embedding_cache")}
+    assert remaining == {EmbeddingCache.text_hash("Fresh"), EmbeddingCache.text_hash("Old")}
+
+
+def test_pick_top_articles_embeds_shared_pool_once(monkeypatch):
+    world = SimpleNamespace(article=[
+        SimpleNamespace(title="Summit opens", url="https://example.com/summit"),
+        SimpleNamespace(title="Rates held", url="https://example.com/rates"),
+    ])
+    business = SimpleNamespace(article=[
+        SimpleNamespace(title="Rates held", url="https://example.com/rates"),
+        SimpleNamespace(title="Shares climb", url="https://example.com/shares"),
+    ])
+    embed_calls = []
+    cluster_inputs = []
+
+    def fake_embed(texts, cache=None):
+        embed_calls.append(list(texts))
+        return np.arange(len(texts) * 2, dtype=float).reshape(len(texts), 2)
+
+    def fake_cluster_headlines(embeddings, min_cluster_size=4):
+        cluster_inputs.append(embeddings)
+        return np.zeros(len(embeddings), dtype=int)
+
+    monkeypatch.setattr(TopExtractor, "embed", staticmethod(fake_embed))
+    monkeypatch.setattr(TopExtractor, "cluster_headlines", staticmethod(fake_cluster_headlines))
+    monkeypatch.setattr(TopExtractor, "cluster_medoid_indices", staticmethod(lambda _emb, _labels: [0]))
+
+    both = SimpleNamespace(selected_feeds=[world, business], top_articles=None)
+    only_business = SimpleNamespace(selected_feeds=[business], top_articles=None)
+
+    TopExtractor.pick_top_articles([both, only_business])
+
+    assert embed_calls == [["Summit opens", "Rates held", "Shares climb"]]
+    np.testing.assert_array_equal(cluster_inputs[0], [[0, 1], [2, 3], [4, 5]])
+    np.testing.assert_array_equal(cluster_inputs[1], [[2, 3], [4, 5]])
+    assert np.shares_memory(cluster_inputs[1], cluster_inputs[0])
+    assert [article.title for article in both.top_articles] == ["Summit opens"]
+    assert [article.title for article in only_business.top_articles] == ["Rates held"]
+
+
+def _reference_mmr_select(candidates, embeddings, top_n, lambda_param=0.6):
+    # Original list-based implementation, kept to pin selection order.
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    sim_matrix = cosine_similarity(embeddings)
+    centroid = embeddings.mean(axis=0)
+    relevance = cosine_similarity(embeddings, centroid.reshape(1, -1)).flatten()
+    selected_idx = [np.argmax(relevance)]
+    while len(selected_idx) < top_n:
+        remaining = [i for i in range(len(candidates)) if i not in selected_idx]
+        scores = []
+        for i in remaining:
+            redundancy = max(sim_matrix[i][selected_idx])
+            scores.append((lambda_param * relevance[i] - (1 - lambda_param) * redundancy, i))
+        selected_idx.append(max(scores)[1])
+    return [candidates[i] for i in selected_idx]
+
+
+def test_mmr_select_matches_reference_selection():
+    rng = np.random.default_rng(7)
+    for n, dtype in [(20, np.float64), (60, np.float32), (200, np.float32)]:
+        embeddings = rng.normal(size=(n, 8)).astype(dtype)
+        candidates = [f"Headline {i}" for i in range(n)]
+
+        assert TopExtractor.mmr_select(candidates, embeddings, top_n=15) == _reference_mmr_select(
+            candidates, embeddings, top_n=15
+        )
+
+
+def test_mmr_select_breaks_ties_like_reference():
+    # Repeated rows produce exact score ties between candidates.
+    embeddings = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 0.0], [0.0, 1.0], [0.7, 0.7], [0.7, 0.7]])
+    candidates = list("abcdef")
+
+    assert TopExtractor.mmr_select(candidates, embeddings, top_n=4) == _reference_mmr_select(
+        candidates, embeddings, top_n=4
+    )
+
+
+def test_linear_medoids_match_exact_medoids():
+    rng = np.random.default_rng(11)
+    centres = rng.normal(size=(6, 16))
+    labels = rng.integers(-1, 6, size=300)
+    embeddings = centres[np.clip(labels, 0, None)] + 0.3 * rng.normal(size=(300, 16))
+    embeddings[5] = 0.0  # zero vectors are handled like cosine_similarity does
+
+    linear = TopExtractor.cluster_medoid_indices(embeddings, labels, exact=False)
+    exact = TopExtractor.cluster_medoid_indices(embeddings, labels, exact=True)
+
+    assert linear == exact
+    assert TopExtractor.cluster_medoid_indices(embeddings, np.full(300, -1)) == []
+
+
+def test_embedding_backend_loads_once_across_threads(monkeypatch):
+    import threading
+
+    loads = []
+
+    class CountingModel:
+        def __init__(self, name):
+            loads.append(name)
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers", SimpleNamespace(SentenceTransformer=CountingModel))
+    monkeypatch.setattr(TopExtractor, "_backend", None)
+    monkeypatch.setattr(TopExtractor, "BACKEND", "sentence-transformers")
+
+    threads = [threading.Thread(target=TopExtractor.warm_up) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == [TopExtractor.MODEL_NAME]
+    assert isinstance(TopExtractor.embedding_backend().model, CountingModel)
+    assert TopExtractor.embedding_backend().name == TopExtractor.MODEL_NAME
+
+
+def test_embed_with_warm_cache_never_loads_the_model(monkeypatch, tmp_path):
+    import top_extractor as top_extractor_module
+
+    loads = []
+
+    def counting_backend(kind, model_name):
+        loads.append(kind)
+        return SimpleNamespace(name=model_name, encode=lambda texts: np.ones((len(texts), 2)))
+
+    monkeypatch.setattr(top_extractor_module, "make_backend", counting_backend)
+    monkeypatch.setattr(TopExtractor, "_backend", None)
+    monkeypatch.setattr(TopExtractor, "BACKEND", "sentence-transformers")
+    cache = EmbeddingCache(str(tmp_path / "cache.db"))
+    TopExtractor.embed(["Rain today", "Sun"], cache=cache) # Cold: loads once
+    cache.close()
+    monkeypatch.setattr(TopExtractor, "_backend", None) # A fresh process
+
+    warm = EmbeddingCache(str(tmp_path / "cache.db"))
+    vectors = TopExtractor.embed(["Sun", "Rain today"], cache=warm)
+
+    assert loads == ["sentence-transformers"]
+    assert (warm.hits, warm.misses) == (2, 0)
+    np.testing.assert_array_equal(vectors, np.ones((2, 2)))
+
+
+class _NearestHDBSCAN:
+    """Picklable stand-in: clusters by the sign of the first coordinate."""
+
+    fits = 0
+
+    def __init__(self, min_cluster_size=4, prediction_data=False):
+        self.prediction_data = prediction_data
+
+    def fit_predict(self, embeddings):
+        _NearestHDBSCAN.fits += 1
+        self.points = np.asarray(embeddings, dtype=float)
+        self.labels_ = np.where(self.points[:, 0] > 0, 0, 1)
+        return self.labels_
+
+
+def _approximate_predict(clusterer, points):
+    distances = np.linalg.norm(np.asarray(points)[:, None, :] - clusterer.points[None, :, :], axis=2)
+    labels = clusterer.labels_[distances.argmin(axis=1)]
+    labels = np.where(distances.min(axis=1) > 1.0, -1, labels)
+    return labels, np.ones(len(points))
+
+
+def test_cluster_incremental_assigns_new_headlines_without_refitting(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, "hdbscan", SimpleNamespace(HDBSCAN=_NearestHDBSCAN, approximate_predict=_approximate_predict))
+    monkeypatch.setattr(_NearestHDBSCAN, "fits", 0)
+    clusters = ClusterCache(str(tmp_path / "cache.db"))
+    headlines = [f"Story {i}" for i in range(8)]
+    embeddings = np.array([[5.0 + i, 0.0] if i < 4 else [-5.0 - i, 0.0] for i in range(8)])
+
+    first = TopExtractor.cluster_incremental("World", "model", headlines, embeddings, clusters)
+    again = TopExtractor.cluster_incremental("World", "model", headlines[::-1], embeddings[::-1], clusters)
+    grown = TopExtractor.cluster_incremental(
+        "World", "model", headlines + ["Story 8"], np.vstack([embeddings, [[5.2, 0.0]]]), clusters,
+    )
+
+    assert _NearestHDBSCAN.fits == 1
+    np.testing.assert_array_equal(first, [0, 0, 0, 0, 1, 1, 1, 1])
+    np.testing.assert_array_equal(again, first[::-1])
+    np.testing.assert_array_equal(grown, [0, 0, 0, 0, 1, 1, 1, 1, 0])
+    assert clusters.get("World", "model").drift == 1
+    assert clusters.get("World", "other-model") is None
+
+
+def test_cluster_incremental_refits_after_drift_or_noise(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, "hdbscan", SimpleNamespace(HDBSCAN=_NearestHDBSCAN, approximate_predict=_approximate_predict))
+    monkeypatch.setattr(_NearestHDBSCAN, "fits", 0)
+    clusters = ClusterCache(str(tmp_path / "cache.db"))
+    headlines = [f"Story {i}" for i in range(8)]
+    embeddings = np.array([[5.0 + i, 0.0] for i in range(8)])
+    TopExtractor.cluster_incremental("World", "model", headlines, embeddings, clusters)
+
+    # Three of eight headlines replaced: drift 6 > 0.25 * 8
+    replaced = headlines[:5] + ["New 0", "New 1", "New 2"]
+    TopExtractor.cluster_incremental("World", "model", replaced, embeddings, clusters)
+    assert _NearestHDBSCAN.fits == 2
+
+    # Four far-away headlines stay within the drift budget but are all noise
+    monkeypatch.setattr(TopExtractor, "DRIFT_THRESHOLD", 1.0)
+    far = np.vstack([embeddings, [[-50.0, 0.0]] * 4])
+    labels = TopExtractor.cluster_incremental("World", "model", replaced + [f"Far {i}" for i in range(4)], far, clusters)
+    assert _NearestHDBSCAN.fits == 3
+    np.testing.assert_array_equal(labels, [0] * 8 + [1] * 4)
+    assert clusters.get("World", "model").fitted == 12